@@ -1,12 +1,111 @@
 import os
+from typing import Optional
+
+import httpx
 from dotenv import load_dotenv
-from supabase import create_client, Client
+from supabase import acreate_client, AsyncClient, AsyncClientOptions
+
+from app.utils.metrics import httpx_event_hooks
 
 load_dotenv()
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_ROLE = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 
-def get_supabase() -> Client:
-    supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE)
-    return supabase
+# Connection pool shared by every request
+SUPABASE_POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "20"))
+SUPABASE_POOL_KEEPALIVE = int(os.getenv("SUPABASE_POOL_KEEPALIVE", "10"))
+SUPABASE_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", "30"))
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "10"))
+SUPABASE_CONNECT_TIMEOUT = float(os.getenv("SUPABASE_CONNECT_TIMEOUT", "5"))
+
+_http: Optional[httpx.AsyncClient] = None
+_client: Optional[AsyncClient] = None
+
+async def init_supabase(transport: Optional[httpx.AsyncBaseTransport] = None) -> AsyncClient:
+    """
+    Create the application-scoped async client and its keep-alive pool.
+    Called from the app lifespan; safe to call more than once. A
+    transport (e.g. httpx.MockTransport) replaces the network, for
+    benchmarks/bench_user_lookup.py.
+    """
+    global _http, _client
+    if _client is None:
+        _http = httpx.AsyncClient(
+            transport=transport,
+            limits=httpx.Limits(
+                max_connections=SUPABASE_POOL_SIZE,
+                max_keepalive_connections=SUPABASE_POOL_KEEPALIVE,
+                keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(SUPABASE_TIMEOUT, connect=SUPABASE_CONNECT_TIMEOUT),
+            # per-request DB call count, size and latency for /metrics
+            event_hooks=httpx_event_hooks(),
+        )
+        _client = await acreate_client(
+            SUPABASE_URL,
+            SUPABASE_SERVICE_ROLE,
+            options=AsyncClientOptions(
+                httpx_client=_http,
+                postgrest_client_timeout=SUPABASE_TIMEOUT,
+            ),
+        )
+    return _client
+
+async def close_supabase():
+    """Close the shared pool at shutdown."""
+    global _http, _client
+    if _http is not None:
+        await _http.aclose()
+    _http = None
+    _client = None
+
+def get_supabase() -> AsyncClient:
+    if _client is None:
+        raise RuntimeError("Supabase client is not initialised; init_supabase() runs in the app lifespan")
+    return _client
+
+def quote(value) -> str:
+    """
+    A value for a PostgREST logic filter (or_/and_ strings), double-quoted
+    with \\ and " escaped, so , . ( ) inside it cannot change the filter.
+    """
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+async def fetch_all(build_query, page_size: int = 1000):
+    """
+    Fetch every row of a query, paging with .range() so PostgREST's
+    max-rows cap never truncates the result. build_query must return
+    a fresh, ordered select builder on each call.
+    """
+    rows = []
+    start = 0
+    while True:
+        page = (await build_query().range(start, start + page_size - 1).execute()).data
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        start += page_size
+
+async def fetch_page(table: str, key: str, columns: str = "*", filters: dict = None, after=None, limit: int = 1000):
+    """
+    One keyset page ordered by key: up to `limit` rows whose key is
+    greater than `after`. Filters with a None value are ignored.
+    """
+    query = get_supabase().table(table).select(columns)
+    for column, value in (filters or {}).items():
+        if value is not None:
+            query = query.eq(column, value)
+    if after is not None:
+        query = query.gt(key, after)
+    return (await query.order(key).limit(limit).execute()).data
+
+async def iter_pages(table: str, key: str, columns: str = "*", filters: dict = None, after=None, page_size: int = 1000):
+    """Yield keyset pages until the table is exhausted; one page in memory at a time."""
+    while True:
+        rows = await fetch_page(table, key, columns, filters, after, page_size)
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        after = rows[-1][key]
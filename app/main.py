@@ -1,10 +1,57 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import users, skills, opportunities, mentorships, opportunity_skills, user_skills, match,chat
+from fastapi.responses import PlainTextResponse
+from app.db import init_supabase, close_supabase
+from app.ml.skill_index import skill_index
+from app.ml.match_cache import match_cache
+from app.ml.opportunity_index import opportunity_index
+from app.ml.index_sync import index_sync
+from app.utils.hashing import start_hash_pool, stop_hash_pool, hash_pool_stats
+from app.utils import metrics
+from app.utils import profiler
+from app.utils.auth import get_current_user
+from app.utils.cache import user_cache, skill_cache, close_caches
+from app.routes import users, skills, opportunities, mentorships, opportunity_skills, user_skills, match,chat, bulk
+from app.routes.chat import manager as chat_manager
+from app.utils.message_writer import message_writer
+
+# ---------------- LIFESPAN ----------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled Supabase client shared by every router
+    await init_supabase()
+    start_hash_pool()
+    # Chat fan-out and shared presence across workers
+    await chat_manager.start()
+    message_writer.start()
+    # Index writes made on one worker are replayed on the others
+    await index_sync.start()
+
+    # Warm the skill index once; routes fall back to Supabase while it is cold
+    try:
+        await skill_index.warm()
+        print(f"✅ Skill index warmed: {skill_index.stats()}")
+    except Exception as e:
+        print(f"Skill index warm-up failed, serving from Supabase: {e}")
+
+    # Precompute match recommendations in the background
+    if skill_index.ready:
+        match_cache.start()
+    yield
+    await match_cache.stop()
+    await index_sync.stop()
+    # Drain queued chat messages before the Supabase client goes away
+    await message_writer.stop()
+    await chat_manager.stop()
+    stop_hash_pool()
+    await close_caches()
+    await close_supabase()
 
 app = FastAPI(
     title="SkillSync Backend (Supabase)",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # ---------------- CORS (Important for frontend) ----------------
@@ -14,18 +61,71 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# ---------------- METRICS ----------------
+# Per-route latency and per-request Supabase call count/size; see /metrics
+app.middleware("http")(metrics.metrics_middleware)
+
+# Opt-in sampling profiler; when disabled nothing is installed at all
+if profiler.PROFILING_ENABLED:
+    from app.routes import debug
+    app.middleware("http")(profiler.profile_middleware)
+    app.include_router(debug.router)
+
 # ---------------- ROUTERS ----------------
+# Every router except users (register/login stay public) requires a Bearer token
+auth = [Depends(get_current_user)]
+
 app.include_router(users.router, prefix="/users", tags=["Users"])
-app.include_router(skills.router, prefix="/skills", tags=["Skills"])
-app.include_router(opportunities.router, prefix="/opportunities", tags=["Opportunities"])
-app.include_router(mentorships.router)
-app.include_router(opportunity_skills.router, prefix="/opportunity-skills", tags=["Opportunity Skills"])
-app.include_router(user_skills.router)
-app.include_router(match.router, prefix="/match", tags=["Matching"])
+app.include_router(skills.router, prefix="/skills", tags=["Skills"], dependencies=auth)
+app.include_router(opportunities.router, prefix="/opportunities", tags=["Opportunities"], dependencies=auth)
+app.include_router(mentorships.router, dependencies=auth)
+app.include_router(opportunity_skills.router, prefix="/opportunity-skills", tags=["Opportunity Skills"], dependencies=auth)
+app.include_router(user_skills.router, dependencies=auth)
+app.include_router(match.router, prefix="/match", tags=["Matching"], dependencies=auth)
 app.include_router(chat.router)
+app.include_router(bulk.router, dependencies=auth)
 # ---------------- HEALTH CHECK ----------------
 @app.get("/")
-def root():
-    return {"message": "SkillSync Backend is running 🚀"}
\ No newline at end of file
+async def root():
+    return {"message": "SkillSync Backend is running 🚀"}
+
+
+@app.get("/cache-stats", dependencies=auth)
+async def cache_stats():
+    """Hit, miss and eviction counts of the lookup and recommendation caches"""
+    return {
+        "users": user_cache.stats(),
+        "skills": skill_cache.stats(),
+        "opportunities": opportunity_index.stats(),
+        "index_sync": index_sync.stats(),
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus text exposition: request metrics plus chat, hashing and writer gauges"""
+    ws = chat_manager.stats()
+    hashing = hash_pool_stats()
+    writer = message_writer.stats()
+    text = metrics.render(
+        metrics.gauge("ws_connected_users", "Users with a socket on this worker.", [({}, ws["users"])]),
+        metrics.gauge("ws_connected_sockets", "Open chat sockets on this worker.", [({}, ws["sockets"])]),
+        metrics.counter("ws_connections_opened_total", "Chat sockets accepted since start.", [({}, ws["connections_opened"])]),
+        metrics.counter(
+            "ws_frames_received_total", "Chat frames received since start, by event type.",
+            [({"type": t}, n) for t, n in sorted(ws["frames_received"].items(), key=lambda item: str(item[0]))]
+        ),
+        metrics.counter("ws_frames_sent_total", "Chat frames written to sockets since start.", [({}, ws["sent"])]),
+        metrics.counter("ws_frames_dropped_total", "Chat frames dropped for slow consumers.", [({}, ws["dropped"])]),
+        metrics.gauge("ws_frames_queued", "Chat frames waiting in socket queues.", [({}, ws["queued"])]),
+        metrics.gauge("ws_send_latency_max_seconds", "Slowest queue-to-socket send.", [({}, ws["max_send_latency_ms"] / 1000)]),
+        metrics.gauge("hash_pool_in_flight", "Password hashes running or queued.", [({}, hashing["in_flight"])]),
+        metrics.gauge("message_writer_pending", "Chat messages waiting for a batched insert.", [({}, writer["pending"])]),
+        metrics.counter("message_writer_written_total", "Chat messages persisted since start.", [({}, writer["written"])]),
+        metrics.counter("message_writer_retries_total", "Batched inserts retried after a transient error.", [({}, writer["retries"])]),
+        metrics.counter("message_writer_failed_total", "Chat messages the database rejected.", [({}, writer["failed"])]),
+    )
+    return PlainTextResponse(text, media_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,88 @@
+# app/ml/index_sync.py
+import asyncio
+import os
+
+from app.ml.skill_index import skill_index
+from app.ml.opportunity_index import opportunity_index
+from app.utils.broker import broker, WORKER_ID
+
+INDEX_SYNC_MS = float(os.getenv("INDEX_SYNC_MS", "100"))
+INDEX_CHANNEL = "index:changes"
+
+
+class IndexSync:
+    """
+    Keeps the process-resident indexes of every worker in step. Writes
+    to the skill index are recorded where they happen and published on
+    INDEX_CHANNEL through the chat broker every INDEX_SYNC_MS, together
+    with opportunity invalidations; every other worker replays them on
+    its own index (its match cache then refreshes the touched users).
+
+    With CHAT_BROKER=memory there is only one worker and nothing to
+    send. Pub/sub does not redeliver, so a change lost while Redis was
+    unreachable is picked up by the next full match-cache refresh,
+    which warms the skill index again, and by OPPORTUNITY_INDEX_TTL.
+    """
+
+    def __init__(self, interval_ms: float = INDEX_SYNC_MS):
+        self.interval = interval_ms / 1000
+        self._task = None
+        self.sent = 0
+        self.received = 0
+        self.failed = 0
+
+    async def _received(self, message: dict):
+        if message.get("worker") == WORKER_ID:
+            return
+        self.received += 1
+        try:
+            skill_index.apply(message.get("skills", ()))
+            if message.get("opportunities"):
+                opportunity_index.drop()
+        except Exception as e:
+            print(f"Error applying index changes from {message.get('worker')}: {e}")
+
+    async def flush(self):
+        changes = skill_index.take_changes()
+        opportunities = opportunity_index.take_changed()
+        if not changes and not opportunities:
+            return
+        try:
+            await broker.publish(INDEX_CHANNEL, {
+                "worker": WORKER_ID,
+                "skills": changes,
+                "opportunities": opportunities,
+            })
+            self.sent += 1
+        except Exception as e:
+            self.failed += 1
+            print(f"Error publishing {len(changes)} index changes: {e}")
+
+    # ---------------- BACKGROUND JOB ----------------
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def start(self):
+        """After broker.start(); subscribes before the first warm-up."""
+        skill_index.start_recording()
+        await broker.subscribe(INDEX_CHANNEL, self._received)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.flush()
+
+    def stats(self):
+        return {"sent": self.sent, "received": self.received, "failed": self.failed}
+
+
+index_sync = IndexSync()
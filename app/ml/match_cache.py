@@ -0,0 +1,158 @@
+# app/ml/match_cache.py
+import asyncio
+import os
+import time
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.ml.skill_index import skill_index
+
+MATCH_CACHE_TOP_N = int(os.getenv("MATCH_CACHE_TOP_N", "50"))
+MATCH_CACHE_INTERVAL = float(os.getenv("MATCH_CACHE_INTERVAL", "5"))
+MATCH_CACHE_FULL_INTERVAL = float(os.getenv("MATCH_CACHE_FULL_INTERVAL", "3600"))
+
+
+def target_role(role: str) -> str:
+    return "mentor" if role == "mentee" else "mentee"
+
+
+class MatchCache:
+    """
+    Precomputed top-N matches for every indexed user, keyed by user_id.
+    An entry is stale while the skill index reports its user dirty.
+
+    A background task does a full refresh at startup and every
+    MATCH_CACHE_FULL_INTERVAL seconds, warming the skill index again
+    first; in between it recomputes only the users the skill index
+    reports as touched by a write (here or, replicated, on another
+    worker).
+    """
+
+    def __init__(self, top_n: int = MATCH_CACHE_TOP_N):
+        self.top_n = top_n
+        self._entries = {}      # user_id -> matches
+        self._pending = set()   # taken from the index, not recomputed yet
+        self._task = None
+        self.hits = 0
+        self.misses = 0
+        self.last_full_refresh = None
+        self.last_incremental_refresh = None
+
+    # ---------------- READ ----------------
+    def get(self, user_id, limit=None):
+        """
+        Cached matches, or None when the entry is missing, stale, or
+        cannot answer the limit (only the top N are kept).
+        """
+        matches = self._entries.get(user_id)
+        if matches is None or user_id in self._pending or skill_index.is_dirty(user_id):
+            self.misses += 1
+            return None
+
+        complete = len(matches) < self.top_n
+        if not complete and (limit is None or limit > self.top_n):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return matches if limit is None else matches[:max(limit, 0)]
+
+    # ---------------- REFRESH ----------------
+    def _compute(self, user_ids):
+        for user_id in user_ids:
+            user = skill_index.users.get(user_id)
+            if user is None:
+                self._entries.pop(user_id, None)
+                continue
+            matches = skill_index.matches_for(user_id, target_role(user["role"]), limit=self.top_n)
+            if matches is not None:
+                self._entries[user_id] = matches
+
+    async def refresh_full(self, rewarm: bool = True):
+        if rewarm:
+            # re-read the skill graph: catches writes another worker's
+            # replicated changes did not deliver (see index_sync.py)
+            await skill_index.warm()
+        dirty = skill_index.take_dirty()
+        user_ids = skill_index.user_ids()
+
+        self._pending |= dirty
+        start = time.perf_counter()
+        try:
+            await run_in_threadpool(self._compute, user_ids)
+        finally:
+            self._pending -= dirty
+        for user_id in set(self._entries) - set(user_ids):
+            del self._entries[user_id]
+
+        self.last_full_refresh = {
+            "users": len(user_ids),
+            "seconds": time.perf_counter() - start,
+            "version": skill_index.version,
+        }
+        print(f"Match cache full refresh: {len(user_ids)} users in {self.last_full_refresh['seconds']:.2f}s")
+
+    async def refresh_dirty(self):
+        dirty = skill_index.take_dirty()
+        if not dirty:
+            return
+
+        self._pending |= dirty
+        start = time.perf_counter()
+        try:
+            await run_in_threadpool(self._compute, list(dirty))
+        finally:
+            self._pending -= dirty
+
+        self.last_incremental_refresh = {
+            "users": len(dirty),
+            "seconds": time.perf_counter() - start,
+            "version": skill_index.version,
+        }
+
+    # ---------------- BACKGROUND JOB ----------------
+    async def _run(self):
+        try:
+            # the index was just warmed by the app lifespan
+            await self.refresh_full(rewarm=False)
+        except Exception as e:
+            print(f"Match cache full refresh failed: {e}")
+        last_full = time.monotonic()
+        while True:
+            await asyncio.sleep(MATCH_CACHE_INTERVAL)
+            try:
+                if time.monotonic() - last_full >= MATCH_CACHE_FULL_INTERVAL:
+                    await self.refresh_full()
+                    last_full = time.monotonic()
+                else:
+                    await self.refresh_dirty()
+            except Exception as e:
+                print(f"Match cache refresh failed: {e}")
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "users": len(self._entries),
+            "top_n": self.top_n,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "last_full_refresh": self.last_full_refresh,
+            "last_incremental_refresh": self.last_incremental_refresh,
+        }
+
+
+match_cache = MatchCache()
@@ -1,4 +1,6 @@
 # app/ml/matcher.py
+import numpy as np
+from scipy.sparse import csr_matrix, diags
 from sklearn.metrics.pairwise import cosine_similarity
 
 def build_skill_vector(user_skills, all_skills):
@@ -13,3 +15,170 @@ def compute_match_score(mentee_vec, mentor_vec):
     Compute cosine similarity between two skill vectors.
     """
     return cosine_similarity([mentee_vec], [mentor_vec])[0][0]
+
+def build_skill_matrix(user_ids, skill_ids, assignments, key="user_id"):
+    """
+    Build a binary CSR user x skill matrix from user_skills rows.
+    Rows follow user_ids and columns follow skill_ids; rows that
+    reference an unknown user or skill are ignored. With key="opp_id"
+    the same builds an opportunity x skill matrix from opportunity_skills.
+    """
+    row_of = {user_id: i for i, user_id in enumerate(user_ids)}
+    col_of = {skill_id: j for j, skill_id in enumerate(skill_ids)}
+
+    rows, cols = [], []
+    for row in assignments:
+        r = row_of.get(row[key])
+        c = col_of.get(row["skill_id"])
+        if r is None or c is None:
+            continue
+        rows.append(r)
+        cols.append(c)
+
+    matrix = csr_matrix(
+        (np.ones(len(rows)), (rows, cols)),
+        shape=(len(user_ids), len(skill_ids))
+    )
+    # duplicate assignments are summed on construction; keep it binary
+    matrix.data[:] = 1
+    return matrix
+
+def score_candidates(candidates, query):
+    """
+    Cosine similarity between a 1 x n_skills query row and every
+    row of the candidate matrix, computed as one sparse product.
+    """
+    if candidates.shape[0] == 0:
+        return np.zeros(0)
+    return cosine_similarity(candidates, query, dense_output=True).ravel()
+
+SCORERS = ("cosine", "idf_cosine", "jaccard", "blend")
+
+# experience_level values in increasing order; unknown levels get no boost
+EXPERIENCE_LEVELS = {"beginner": 0, "intermediate": 1, "advanced": 2, "expert": 3}
+
+BLEND_CATEGORY_WEIGHT = 0.3
+BLEND_EXPERIENCE_BOOST = 0.2
+
+def idf_weights(doc_freq, n_users):
+    """
+    Smoothed inverse document frequency of every skill column, so a
+    rare skill outweighs one that nearly every user holds.
+    """
+    doc_freq = np.asarray(doc_freq, dtype=float)
+    return np.log((1 + n_users) / (1 + doc_freq)) + 1
+
+def experience_rank(level):
+    if not level:
+        return np.nan
+    return EXPERIENCE_LEVELS.get(str(level).strip().lower(), np.nan)
+
+def score_idf_cosine(candidates, query, idf):
+    """Cosine similarity after weighting every skill column by its IDF."""
+    weights = diags(idf)
+    return score_candidates(candidates @ weights, query @ weights)
+
+def score_jaccard(candidates, query):
+    """|A & B| / |A | B| of the query against every candidate row."""
+    if candidates.shape[0] == 0:
+        return np.zeros(0)
+    inter = (candidates @ query.T).toarray().ravel()
+    sizes = np.asarray(candidates.sum(axis=1)).ravel()
+    union = sizes + query.sum() - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+def score_blend(candidates, query, skill_category, candidate_levels, query_level, candidates_are_mentors):
+    """
+    Skill cosine blended with cosine over skill categories (the user x
+    skill matrix projected through a skill x category one-hot matrix),
+    then boosted when the candidate's experience_level sits on the
+    right side of the requester's (mentors above, mentees below).
+    Only users who already share a skill with the requester score > 0.
+    """
+    skill_sim = score_candidates(candidates, query)
+    category_sim = score_candidates(
+        (candidates @ skill_category).sign(), (query @ skill_category).sign()
+    )
+    base = (skill_sim + BLEND_CATEGORY_WEIGHT * category_sim) / (1 + BLEND_CATEGORY_WEIGHT)
+    base[skill_sim == 0] = 0
+
+    levels = np.asarray(candidate_levels, dtype=float)
+    gap = (levels - query_level) if candidates_are_mentors else (query_level - levels)
+    boost = np.where(np.nan_to_num(gap, nan=0.0) > 0, 1 + BLEND_EXPERIENCE_BOOST, 1.0)
+    return base * boost
+
+def category_matrix(skill_categories):
+    """
+    One-hot skill x category CSR matrix from a per-column list of
+    categories (None for retired or unknown columns).
+    """
+    index = {}
+    rows, cols = [], []
+    for col, category in enumerate(skill_categories):
+        if category is None:
+            continue
+        rows.append(col)
+        cols.append(index.setdefault(category, len(index)))
+    return csr_matrix(
+        (np.ones(len(rows)), (rows, cols)),
+        shape=(len(skill_categories), max(len(index), 1))
+    )
+
+def score_with(scorer, candidates, query, context):
+    """
+    Score every candidate row with the named scorer in one batched
+    sparse computation. context supplies what the weighted scorers
+    need: idf, skill_category, candidate_levels, query_level and
+    candidates_are_mentors.
+    """
+    if candidates.shape[0] == 0:
+        return np.zeros(0)
+    if scorer == "idf_cosine":
+        return score_idf_cosine(candidates, query, context["idf"])
+    if scorer == "jaccard":
+        return score_jaccard(candidates, query)
+    if scorer == "blend":
+        return score_blend(
+            candidates, query,
+            context["skill_category"],
+            context["candidate_levels"],
+            context["query_level"],
+            context["candidates_are_mentors"],
+        )
+    return score_candidates(candidates, query)
+
+def top_k(scores, k=None):
+    """
+    Indices of the positive scores, best first. Equal scores keep
+    candidate order, exactly like a stable list.sort(reverse=True).
+    Only the top k are sorted when k is given.
+    """
+    idx = np.flatnonzero(scores > 0)
+
+    if k is not None and k < len(idx):
+        if k <= 0:
+            return idx[:0]
+        kth = np.partition(scores[idx], len(idx) - k)[len(idx) - k]
+        above = idx[scores[idx] > kth]
+        tied = idx[scores[idx] == kth][:k - len(above)]
+        idx = np.concatenate([above, tied])
+
+    order = np.lexsort((idx, -scores[idx]))
+    return idx[order]
+
+def rank_matches(targets, scores, skills_of, k=None):
+    """
+    Turn candidate scores into the /match response rows, best first,
+    keeping only relevant (score > 0) matches.
+    """
+    matches = []
+    for i in top_k(scores, k):
+        target = targets[i]
+        matches.append({
+            "username": target["username"],
+            "name": target["name"],
+            "role": target["role"],
+            "skills": skills_of(target),
+            "score": float(scores[i])
+        })
+    return matches
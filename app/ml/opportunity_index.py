@@ -0,0 +1,207 @@
+# app/ml/opportunity_index.py
+import math
+import os
+import time
+from collections import OrderedDict
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.ml.matcher import build_skill_matrix, score_candidates, top_k, rank_matches
+from app.ml.skill_index import skill_index, USER_FIELDS
+from app.repositories import opportunities as opportunities_repo
+from app.repositories import users as users_repo
+from app.repositories import skills as skills_repo
+from app.repositories import user_skills as user_skills_repo
+
+RECOMMEND_TOP_N = int(os.getenv("RECOMMEND_TOP_N", "50"))
+RECOMMEND_CACHE_SIZE = int(os.getenv("RECOMMEND_CACHE_SIZE", "10000"))
+# loaded opportunities are re-read after this long, even without an invalidation
+OPPORTUNITY_INDEX_TTL = float(os.getenv("OPPORTUNITY_INDEX_TTL", "300"))
+
+
+class OpportunityIndex:
+    """
+    Opportunity x skill CSR matrix (built from opportunity_skills with
+    the same binary vector model as user matching) used to rank
+    opportunities for a user and users for an opportunity, with the top
+    RECOMMEND_TOP_N of each kept in an LRU per user and per opportunity.
+
+    Opportunities are loaded lazily and dropped by invalidate() after a
+    write to opportunities or their skills, on every worker (see
+    index_sync.py), or at the latest OPPORTUNITY_INDEX_TTL after loading.
+    Cached rankings are stamped with what they were computed from (a
+    user's: the opportunity version and the user's skill ids; an
+    opportunity's: the opportunity version and the skill index
+    version), so a skill change on either side is never served stale.
+    """
+
+    def __init__(self, top_n: int = RECOMMEND_TOP_N, max_entries: int = RECOMMEND_CACHE_SIZE):
+        self.top_n = top_n
+        self.max_entries = max_entries
+        self.version = 0
+        self._loaded = None                 # see _load()
+        self.changed = False                # invalidated here, not yet sent to other workers
+        self._for_user = OrderedDict()      # user_id -> (stamp, opportunities)
+        self._for_opp = OrderedDict()       # (opp_id, role) -> (stamp, users)
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self):
+        """After a write here; other workers drop theirs too (index_sync.py)."""
+        self.changed = True
+        self.drop()
+
+    def drop(self):
+        self.version += 1
+        self._loaded = None
+        self._for_user.clear()
+        self._for_opp.clear()
+
+    def take_changed(self) -> bool:
+        """Whether invalidate() was called since the last call."""
+        changed, self.changed = self.changed, False
+        return changed
+
+    # ---------------- LOAD ----------------
+    @staticmethod
+    def _build(opportunities, links):
+        skills_by_opp = {}
+        for link in links:
+            skills_by_opp.setdefault(link["opp_id"], []).append(link["skill_id"])
+        columns = list(dict.fromkeys(link["skill_id"] for link in links))
+        return {
+            "opportunities": opportunities,
+            "by_id": {str(opp["opp_id"]): opp for opp in opportunities},
+            "skills_by_opp": skills_by_opp,
+            "column_of": {skill_id: j for j, skill_id in enumerate(columns)},
+            "matrix": build_skill_matrix(
+                [opp["opp_id"] for opp in opportunities], columns, links, key="opp_id"
+            ),
+        }
+
+    async def _load(self):
+        if self._loaded is not None and time.monotonic() - self._loaded["loaded_at"] > OPPORTUNITY_INDEX_TTL:
+            self.drop()
+        if self._loaded is None or self._loaded["version"] != self.version:
+            version = self.version
+            opportunities = await opportunities_repo.list_all()
+            links = await opportunities_repo.list_skill_links()
+            loaded = await run_in_threadpool(self._build, opportunities, links)
+            loaded["version"] = version
+            loaded["loaded_at"] = time.monotonic()
+            if version == self.version:
+                self._loaded = loaded
+            return loaded
+        return self._loaded
+
+    async def get_opportunity(self, opp_id):
+        return (await self._load())["by_id"].get(str(opp_id))
+
+    # ---------------- CACHE ----------------
+    def _get(self, entries, key, stamp):
+        entry = entries.get(key)
+        if stamp is None or entry is None or entry[0] != stamp:
+            self.misses += 1
+            return None
+        entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def _put(self, entries, key, stamp, value):
+        entries[key] = (stamp, value)
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    # ---------------- OPPORTUNITIES FOR A USER ----------------
+    def _rank_opportunities(self, loaded, skill_ids, username, k):
+        """
+        Cosine of the user's skill vector against every opportunity row
+        in one sparse product. Skills no opportunity asks for have no
+        column, so the scores are rescaled to the user's full norm.
+        """
+        known = [s for s in skill_ids if s in loaded["column_of"]]
+        if not known:
+            return []
+        query = build_skill_matrix(
+            [None], list(loaded["column_of"]), [{"user_id": None, "skill_id": s} for s in known]
+        )
+        scores = score_candidates(loaded["matrix"], query) * math.sqrt(len(known) / len(set(skill_ids)))
+
+        opportunities = loaded["opportunities"]
+        for i, opp in enumerate(opportunities):
+            if opp.get("posted_by") == username:
+                scores[i] = 0    # never recommend a user's own postings
+        return [{**opportunities[i], "score": float(scores[i])} for i in top_k(scores, k)]
+
+    async def for_user(self, user, limit=None):
+        if skill_index.ready and skill_index.get_user(user["username"]) is not None:
+            skill_ids = skill_index.user_skill_ids(user["user_id"])
+        else:
+            skill_ids = [row["skill_id"] for row in await user_skills_repo.list_for_user(user["user_id"])]
+
+        loaded = await self._load()
+        stamp = (loaded["version"], tuple(sorted(skill_ids)))
+        ranked = self._get(self._for_user, user["user_id"], stamp)
+        if ranked is None:
+            ranked = await run_in_threadpool(
+                self._rank_opportunities, loaded, skill_ids, user["username"], self.top_n
+            )
+            self._put(self._for_user, user["user_id"], stamp, ranked)
+        return ranked[:limit]
+
+    # ---------------- USERS FOR AN OPPORTUNITY ----------------
+    async def _users_from_db(self, skill_ids, role, k):
+        """Index miss: score users straight from Supabase rows."""
+        targets = await users_repo.list_users(USER_FIELDS, role=role)
+        assignments = await user_skills_repo.list_all()
+        skill_names = {s["skill_id"]: s["name"] for s in await skills_repo.list_skills()}
+
+        skills_by_user = {}
+        for row in assignments:
+            skills_by_user.setdefault(row["user_id"], []).append(skill_names.get(row["skill_id"]))
+
+        def rank():
+            columns = list(dict.fromkeys(list(skill_ids) + [row["skill_id"] for row in assignments]))
+            query = [{"user_id": None, "skill_id": s} for s in skill_ids]
+            matrix = build_skill_matrix(
+                [None] + [t["user_id"] for t in targets], columns, query + assignments
+            )
+            scores = score_candidates(matrix[1:], matrix[0])
+            return rank_matches(targets, scores, lambda t: skills_by_user.get(t["user_id"], []), k)
+
+        return await run_in_threadpool(rank)
+
+    async def users_for(self, opp_id, role=None, limit=None):
+        loaded = await self._load()
+        skill_ids = loaded["skills_by_opp"].get(loaded["by_id"][str(opp_id)]["opp_id"], [])
+
+        # only stamped (and cached) while the skill index tracks user skills
+        stamp = (loaded["version"], skill_index.version) if skill_index.ready else None
+        key = (str(opp_id), role)
+        ranked = self._get(self._for_opp, key, stamp)
+        if ranked is None:
+            ranked = await run_in_threadpool(skill_index.users_for_skills, skill_ids, role, self.top_n)
+            if ranked is None:
+                ranked = await self._users_from_db(skill_ids, role, self.top_n)
+            else:
+                self._put(self._for_opp, key, stamp, ranked)
+        return ranked[:limit]
+
+    # ---------------- STATS ----------------
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "loaded": self._loaded is not None,
+            "opportunities": len(self._loaded["opportunities"]) if self._loaded else None,
+            "version": self.version,
+            "users_cached": len(self._for_user),
+            "opportunities_cached": len(self._for_opp),
+            "top_n": self.top_n,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+opportunity_index = OpportunityIndex()
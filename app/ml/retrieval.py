@@ -0,0 +1,59 @@
+# app/ml/retrieval.py
+import heapq
+import math
+
+# 1.0 keeps retrieval exact; lower values prune harder (faster, lower recall)
+DEFAULT_PRUNE_FACTOR = 1.0
+# how far below the k-th score the bound must be before pruning
+PRUNE_TOLERANCE = 1e-12
+
+
+def shortlist(query_cols, postings, bits, eligible, k=None, prune_factor=DEFAULT_PRUNE_FACTOR):
+    """
+    Candidate retrieval over an inverted index before exact scoring.
+
+    query_cols are the requester's skill columns, postings maps a column
+    to the users holding it, bits maps a user to its skill bitset and
+    eligible is the set of users that may be returned.
+
+    Postings are walked rarest first while overlap counts accumulate.
+    With k given, MaxScore/WAND-style pruning kicks in: once the best
+    cosine an unseen user could still reach (it can share at most the
+    remaining skills) falls below the current k-th best score, the long
+    common-skill postings are skipped altogether; shortlisted users are
+    rescored exactly afterwards. With prune_factor=1.0 this is exact;
+    lower values stop earlier, trading recall for latency.
+
+    Returns the shortlisted user ids (every eligible user that shares a
+    skill with the requester when nothing was pruned).
+    """
+    q = len(query_cols)
+    if q == 0:
+        return []
+
+    cols = sorted(query_cols, key=lambda c: len(postings.get(c, ())))
+    counts = {}
+
+    for i, col in enumerate(cols):
+        if k and len(counts) >= k:
+            # an unseen user shares at most `remaining` skills, so its
+            # cosine c / sqrt(q * |d|) <= sqrt(c / q) <= sqrt(remaining / q)
+            remaining = q - i
+            bound = math.sqrt(remaining / q)
+            kth = heapq.nlargest(
+                k,
+                (c / math.sqrt(q * bin(bits[u]).count("1")) for u, c in counts.items())
+            )[-1]
+            # the bound and the scores round differently (sqrt(1/3) is one
+            # ulp below 1/sqrt(3)); an unseen user that ties the k-th score
+            # can still outrank it on candidate order, so only a clear gap stops
+            if bound * prune_factor < kth - PRUNE_TOLERANCE:
+                break
+
+        for user_id in postings.get(col, ()):
+            if user_id in counts:
+                counts[user_id] += 1
+            elif user_id in eligible:
+                counts[user_id] = 1
+
+    return list(counts)
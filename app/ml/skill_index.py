@@ -0,0 +1,435 @@
+# app/ml/skill_index.py
+import asyncio
+import threading
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from app.ml.matcher import (
+    score_candidates, score_with, rank_matches, idf_weights, category_matrix, experience_rank
+)
+from app.ml.retrieval import shortlist, DEFAULT_PRUNE_FACTOR
+from app.repositories import users as users_repo
+from app.repositories import skills as skills_repo
+from app.repositories import user_skills as user_skills_repo
+
+USER_FIELDS = "user_id, username, name, role, experience_level"
+# writes that are recorded and replayed on the other workers' indexes (index_sync.py)
+REPLICATED_OPS = frozenset((
+    "put_skill", "remove_skill", "put_user", "remove_user",
+    "load_user", "add_user_skills", "remove_user_skill",
+))
+
+
+def _bit_columns(bits: int):
+    """Column positions set in a bitset, lowest first."""
+    cols = []
+    while bits:
+        low = bits & -bits
+        cols.append(low.bit_length() - 1)
+        bits ^= low
+    return cols
+
+
+class SkillIndex:
+    """
+    Process-resident copy of the skill graph: skill rows, the users
+    that hold them (as one bitset per user, one bit per skill) and the
+    users of each role, plus an inverted index (skill -> users) used to
+    shortlist match candidates. Warmed at startup and kept current by
+    the routes that write users, skills and user_skills; with several
+    workers those writes are replayed on every worker's index through
+    index_sync.py, and the match cache's full refresh warms it again.
+
+    Every write bumps `version` and records the users whose matches it
+    may have changed (the user itself and everyone sharing an affected
+    skill), which the match cache drains with take_dirty().
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.ready = False
+        self.hits = 0
+        self.misses = 0
+        self.version = 0
+        self._dirty = set()
+        self._tracking = True
+        self._changes = None        # writes not yet sent to other workers, once recording
+        self._applying = False      # replaying another worker's writes
+        self._replay = None         # writes made while a warm-up reads the tables
+        self._warm_lock = asyncio.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.skills = {}            # skill_id -> skill row
+        self._skill_by_name = {}    # name -> skill_id
+        self._column = {}           # skill_id -> bit position
+        self._column_skill = []     # bit position -> skill_id (None once deleted)
+        self.users = {}             # user_id -> user row (USER_FIELDS only)
+        self._user_by_name = {}     # username -> user_id
+        self._bits = {}             # user_id -> skill bitset
+        self._roles = {}            # role -> {user_id: None}, insertion ordered
+        self._seq = {}              # user_id -> position of the user in its role list
+        self._next_seq = 0
+        self._postings = {}         # bit position -> {user_id}
+
+    # ---------------- WARM-UP ----------------
+    async def warm(self):
+        """
+        (Re)load everything from Supabase. Writes made while the tables
+        are read are replayed on top, so a warm-up never loses them.
+        """
+        async with self._warm_lock:
+            with self._lock:
+                self._replay = []
+            try:
+                skills = await skills_repo.list_skills()
+                users = await users_repo.list_users(USER_FIELDS)
+                assignments = await user_skills_repo.list_all()
+            except BaseException:
+                with self._lock:
+                    self._replay = None
+                raise
+
+            with self._lock:
+                replay, self._replay = self._replay, None
+                self._tracking = False
+                self._reset()
+                for skill in skills:
+                    self._put_skill(skill)
+                for user in users:
+                    self._put_user(user)
+                for row in assignments:
+                    self._add_user_skill(row["user_id"], row["skill_id"])
+                self.apply(replay)
+                # a warm-up is followed by a full match refresh
+                self._dirty = set()
+                self._tracking = True
+                self.version += 1
+                self.ready = True
+
+    # ---------------- REPLICATION ----------------
+    def _record(self, op, *args):
+        if self._replay is not None:
+            self._replay.append((op, args))
+        if self._changes is not None and not self._applying:
+            self._changes.append((op, args))
+
+    def start_recording(self):
+        """From now on keep the writes made here for take_changes()."""
+        with self._lock:
+            if self._changes is None:
+                self._changes = []
+
+    def take_changes(self):
+        """(op, args) of the writes made here since the last call; clears them."""
+        with self._lock:
+            if self._changes is None:
+                return []
+            changes, self._changes = self._changes, []
+            return changes
+
+    def apply(self, changes):
+        """Replay writes recorded by another worker's index (or during a warm-up)."""
+        with self._lock:
+            applying, self._applying = self._applying, True
+            try:
+                for op, args in changes:
+                    if op in REPLICATED_OPS:
+                        getattr(self, op)(*args)
+            finally:
+                self._applying = applying
+
+    # ---------------- CHANGE TRACKING ----------------
+    def _touch(self, user_ids):
+        if not self._tracking:
+            return
+        self.version += 1
+        self._dirty.update(user_ids)
+
+    def _touch_user(self, user_id):
+        """A user changed: it and everyone sharing one of its skills."""
+        if not self._tracking:
+            return
+        affected = {user_id}
+        for col in _bit_columns(self._bits.get(user_id, 0)):
+            affected |= self._postings[col]
+        self._touch(affected)
+
+    def take_dirty(self):
+        """Users touched since the last call; clears the set."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            return dirty
+
+    def is_dirty(self, user_id) -> bool:
+        return user_id in self._dirty
+
+    # ---------------- SKILLS ----------------
+    def _put_skill(self, skill: dict):
+        skill_id = skill["skill_id"]
+        old = self.skills.get(skill_id)
+        if old and self._skill_by_name.get(old["name"]) == skill_id:
+            del self._skill_by_name[old["name"]]
+        if old and old["name"] != skill["name"]:
+            # cached matches list skills by name
+            self._touch(self._postings[self._column[skill_id]])
+        self.skills[skill_id] = skill
+        self._skill_by_name[skill["name"]] = skill_id
+        if skill_id not in self._column:
+            self._column[skill_id] = len(self._column_skill)
+            self._postings[len(self._column_skill)] = set()
+            self._column_skill.append(skill_id)
+
+    def put_skill(self, skill: dict):
+        with self._lock:
+            self._record("put_skill", skill)
+            self._put_skill(skill)
+
+    def remove_skill(self, skill: dict):
+        with self._lock:
+            self._record("remove_skill", skill)
+            skill_id = skill["skill_id"]
+            self.skills.pop(skill_id, None)
+            if self._skill_by_name.get(skill["name"]) == skill_id:
+                del self._skill_by_name[skill["name"]]
+            col = self._column.pop(skill_id, None)
+            if col is None:
+                return
+            # the column is retired, never reused
+            self._column_skill[col] = None
+            mask = ~(1 << col)
+            holders = self._postings[col]
+            if self._tracking:
+                # the holders and everyone sharing any of their skills, each posting list once
+                cols = set()
+                for user_id in holders:
+                    cols.update(_bit_columns(self._bits[user_id]))
+                affected = set(holders)
+                for c in cols:
+                    affected |= self._postings[c]
+                self._touch(affected)
+            del self._postings[col]
+            for user_id in holders:
+                self._bits[user_id] &= mask
+
+    # ---------------- USERS ----------------
+    def _put_user(self, user: dict):
+        row = {field: user.get(field) for field in USER_FIELDS.split(", ")}
+        user_id = row["user_id"]
+        old = self.users.get(user_id)
+        if old != row:
+            self._touch_user(user_id)
+        if old:
+            self._roles.get(old["role"], {}).pop(user_id, None)
+            if self._user_by_name.get(old["username"]) == user_id:
+                del self._user_by_name[old["username"]]
+        self.users[user_id] = row
+        self._user_by_name[row["username"]] = user_id
+        self._roles.setdefault(row["role"], {})[user_id] = None
+        self._seq[user_id] = self._next_seq
+        self._next_seq += 1
+        self._bits.setdefault(user_id, 0)
+
+    def put_user(self, user: dict):
+        with self._lock:
+            self._record("put_user", user)
+            self._put_user(user)
+
+    def remove_user(self, username: str):
+        with self._lock:
+            self._record("remove_user", username)
+            user_id = self._user_by_name.pop(username, None)
+            if user_id is None:
+                return
+            self._touch_user(user_id)
+            user = self.users.pop(user_id)
+            self._roles.get(user["role"], {}).pop(user_id, None)
+            self._seq.pop(user_id, None)
+            self._clear_user_skills(user_id)
+            self._bits.pop(user_id, None)
+
+    def get_user(self, username: str):
+        """Indexed user row, or None when the user is not indexed."""
+        with self._lock:
+            user_id = self._user_by_name.get(username)
+            return self.users.get(user_id) if user_id is not None else None
+
+    def load_user(self, user: dict, skill_ids):
+        """Read-through fill after a miss: replace a user's row and skills."""
+        skill_ids = list(skill_ids)
+        with self._lock:
+            self._record("load_user", user, skill_ids)
+            self._put_user(user)
+            self._clear_user_skills(user["user_id"])
+            for skill_id in skill_ids:
+                self._add_user_skill(user["user_id"], skill_id)
+            self._touch_user(user["user_id"])
+
+    # ---------------- USER SKILLS ----------------
+    def _add_user_skill(self, user_id, skill_id):
+        col = self._column.get(skill_id)
+        if col is None or user_id not in self._bits:
+            return
+        self._bits[user_id] |= 1 << col
+        self._postings[col].add(user_id)
+
+    def _clear_user_skills(self, user_id):
+        self._touch_user(user_id)
+        for col in _bit_columns(self._bits.get(user_id, 0)):
+            self._postings[col].discard(user_id)
+        if user_id in self._bits:
+            self._bits[user_id] = 0
+
+    def add_user_skills(self, user_id, skill_ids):
+        skill_ids = list(skill_ids)
+        with self._lock:
+            self._record("add_user_skills", user_id, skill_ids)
+            for skill_id in skill_ids:
+                self._add_user_skill(user_id, skill_id)
+            self._touch_user(user_id)
+
+    def remove_user_skill(self, user_id, skill_id):
+        with self._lock:
+            self._record("remove_user_skill", user_id, skill_id)
+            col = self._column.get(skill_id)
+            if col is not None and user_id in self._bits:
+                self._touch_user(user_id)
+                self._bits[user_id] &= ~(1 << col)
+                self._postings[col].discard(user_id)
+
+    def user_skill_ids(self, user_id):
+        with self._lock:
+            bits = self._bits.get(user_id, 0)
+            return [self._column_skill[col] for col in _bit_columns(bits)]
+
+    def user_skills(self, username: str):
+        """
+        Skill rows held by a user, or None on a miss (index cold or
+        user not indexed) so the caller can fall back to Supabase.
+        """
+        with self._lock:
+            user_id = self._user_by_name.get(username) if self.ready else None
+            if user_id is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return [self.skills[skill_id] for skill_id in self.user_skill_ids(user_id)]
+
+    # ---------------- MATCHING ----------------
+    def match_inputs(self, user_id, role: str, k=None, prune_factor=DEFAULT_PRUNE_FACTOR):
+        """
+        Everything find_matches needs, taken under one lock: the
+        candidate rows of the given role and a binary CSR matrix whose
+        row 0 is the requester and rows 1.. the candidates. Candidates
+        are shortlisted through the inverted index (see retrieval.py)
+        and kept in role-list order so ties rank as in a full scan.
+        Returns None on a miss.
+        """
+        with self._lock:
+            if not self.ready or user_id not in self._bits:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+            eligible = self._roles.get(role, {})
+            shortlisted = shortlist(
+                _bit_columns(self._bits[user_id]), self._postings, self._bits,
+                eligible, k=k, prune_factor=prune_factor
+            )
+            shortlisted.sort(key=self._seq.__getitem__)
+            candidates = [self.users[u] for u in shortlisted if u != user_id]
+            matrix = self._csr([self._bits[uid] for uid in [user_id] + [c["user_id"] for c in candidates]])
+            return candidates, matrix
+
+    def _csr(self, bitsets):
+        """Binary CSR matrix with one row per bitset, one column per skill bit."""
+        rows, cols = [], []
+        for r, bits in enumerate(bitsets):
+            for col in _bit_columns(bits):
+                rows.append(r)
+                cols.append(col)
+        return csr_matrix(
+            (np.ones(len(rows)), (rows, cols)),
+            shape=(len(bitsets), len(self._column_skill))
+        )
+
+    def matches_for(self, user_id, role: str, limit=None, prune_factor=DEFAULT_PRUNE_FACTOR, scorer="cosine"):
+        """Ranked matches for an indexed user, or None on a miss."""
+        with self._lock:
+            # the pruning bound only holds for plain cosine
+            k = limit if scorer == "cosine" else None
+            indexed = self.match_inputs(user_id, role, k=k, prune_factor=prune_factor)
+            if indexed is None:
+                return None
+            targets, matrix = indexed
+            context = self._scoring_context(scorer, user_id, role, targets)
+
+        scores = score_with(scorer, matrix[1:], matrix[0], context)
+        return rank_matches(targets, scores, lambda t: self.skill_names(t["user_id"]), limit)
+
+    def users_for_skills(self, skill_ids, role=None, limit=None):
+        """
+        Users ranked by cosine against a skill set that belongs to no user
+        (an opportunity's), shortlisted through the inverted index the
+        same way as matches_for. Returns None while the index is cold.
+        """
+        with self._lock:
+            if not self.ready:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+            cols = sorted({self._column[s] for s in skill_ids if s in self._column})
+            eligible = self._roles.get(role, {}) if role else self._bits
+            shortlisted = shortlist(cols, self._postings, self._bits, eligible, k=limit)
+            shortlisted.sort(key=self._seq.__getitem__)
+            targets = [self.users[u] for u in shortlisted]
+            query = sum(1 << col for col in cols)
+            matrix = self._csr([query] + [self._bits[u] for u in shortlisted])
+
+        scores = score_candidates(matrix[1:], matrix[0])
+        return rank_matches(targets, scores, lambda t: self.skill_names(t["user_id"]), limit)
+
+    def _scoring_context(self, scorer, user_id, role, targets):
+        context = {}
+        if scorer == "idf_cosine":
+            context["idf"] = idf_weights(
+                [len(self._postings.get(col, ())) for col in range(len(self._column_skill))],
+                sum(1 for bits in self._bits.values() if bits)
+            )
+        if scorer == "blend":
+            context["skill_category"] = category_matrix([
+                self.skills[skill_id].get("category") if skill_id is not None else None
+                for skill_id in self._column_skill
+            ])
+            context["candidate_levels"] = [experience_rank(t["experience_level"]) for t in targets]
+            context["query_level"] = experience_rank(self.users[user_id]["experience_level"])
+            context["candidates_are_mentors"] = role == "mentor"
+        return context
+
+    def user_ids(self):
+        with self._lock:
+            return list(self.users)
+
+    def skill_names(self, user_id):
+        with self._lock:
+            return [self.skills[skill_id]["name"] for skill_id in self.user_skill_ids(user_id)]
+
+    # ---------------- STATS ----------------
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "ready": self.ready,
+                "skills": len(self.skills),
+                "users": len(self.users),
+                "assignments": sum(bin(b).count("1") for b in self._bits.values()),
+                "roles": {role: len(ids) for role, ids in self._roles.items()},
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+skill_index = SkillIndex()
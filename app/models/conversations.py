@@ -0,0 +1,4 @@
+TABLE_NAME = "conversations"
+# one row per (owner, partner), unique on the pair:
+# last_message, last_message_time, last_from, unread_count (messages to owner not yet read)
+# created by scripts/conversations.sql
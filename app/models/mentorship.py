@@ -1 +1,4 @@
 TABLE_NAME = "mentorships"
+PRIMARY_KEY = "mentorship_id"
+COLUMNS = ("mentorship_id", "mentor_name", "mentee_name")
+# unique (mentor_name, mentee_name): create_if_absent upserts against it
@@ -0,0 +1 @@
+TABLE_NAME = "messages"
@@ -1 +1,3 @@
 TABLE_NAME = "opportunities"
+PRIMARY_KEY = "opp_id"
+COLUMNS = ("opp_id", "title", "description", "posted_by", "type")
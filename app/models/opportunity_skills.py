@@ -0,0 +1,3 @@
+TABLE_NAME = "opportunity_skills"
+# unique (opp_id, skill_id): add_skills upserts against it
+# (scripts/skill_links_unique.sql)
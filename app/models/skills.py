@@ -1 +1,3 @@
 TABLE_NAME = "skills"
+PRIMARY_KEY = "skill_id"
+COLUMNS = ("skill_id", "name", "category", "skill_description")
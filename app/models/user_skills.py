@@ -0,0 +1,3 @@
+TABLE_NAME = "user_skills"
+# unique (user_id, skill_id): create_many and create_rows upsert against it
+# (scripts/skill_links_unique.sql)
@@ -1 +1,7 @@
 TABLE_NAME = "users"
+PRIMARY_KEY = "user_id"
+# every column except password_hash, which never leaves the API
+PUBLIC_COLUMNS = (
+    "user_id", "username", "name", "role",
+    "phone_number", "experience_level", "profile_summary"
+)
@@ -0,0 +1,90 @@
+# app/repositories/conversations.py
+from app.db import get_supabase, quote
+from app.models.conversations import TABLE_NAME
+
+
+async def for_user(username: str):
+    """A user's conversation summaries, most recent first."""
+    res = await (
+        get_supabase().table(TABLE_NAME)
+        .select("*")
+        .eq("owner", username)
+        .order("last_message_time", desc=True)
+        .execute()
+    )
+    return res.data or []
+
+
+def _pair(user_a: str, user_b: str) -> str:
+    a, b = quote(user_a), quote(user_b)
+    return (
+        f"and(owner.eq.{a},partner.eq.{b}),"
+        f"and(owner.eq.{b},partner.eq.{a})"
+    )
+
+
+async def record_messages(messages):
+    """
+    Upsert both sides of every conversation in a batch of stored
+    messages (oldest first), one select and one upsert for the batch:
+    each pair gets its latest message, and each recipient's unread
+    count grows by the messages they received. The bump is
+    read-then-write, so concurrent writers to the same recipient may
+    undercount; mark_read always resets it exactly.
+    """
+    if not messages:
+        return
+    latest, received = {}, {}
+    for message in messages:
+        from_user, to_user = message["from_user"], message["to_user"]
+        latest[frozenset((from_user, to_user))] = message
+        received[(to_user, from_user)] = received.get((to_user, from_user), 0) + 1
+
+    users = list({user for pair in latest for user in pair})
+    res = await (
+        get_supabase().table(TABLE_NAME)
+        .select("owner, partner, unread_count")
+        .in_("owner", users)
+        .in_("partner", users)
+        .execute()
+    )
+    unread = {(row["owner"], row["partner"]): row["unread_count"] for row in res.data}
+
+    rows = []
+    for message in latest.values():
+        summary = {
+            "last_message": message["message"],
+            "last_message_time": message["created_at"],
+            "last_from": message["from_user"],
+        }
+        for owner, partner in {(message["from_user"], message["to_user"]), (message["to_user"], message["from_user"])}:
+            rows.append({
+                "owner": owner, "partner": partner, **summary,
+                "unread_count": unread.get((owner, partner), 0) + received.get((owner, partner), 0),
+            })
+    await get_supabase().table(TABLE_NAME).upsert(rows, on_conflict="owner,partner").execute()
+
+
+async def save_many(rows):
+    """Bulk upsert of full summary rows (scripts/backfill_conversations.py)."""
+    if rows:
+        await get_supabase().table(TABLE_NAME).upsert(rows, on_conflict="owner,partner").execute()
+
+
+async def mark_read(owner: str, partner: str):
+    await (
+        get_supabase().table(TABLE_NAME)
+        .update({"unread_count": 0})
+        .eq("owner", owner)
+        .eq("partner", partner)
+        .execute()
+    )
+
+
+async def delete_pair(user_a: str, user_b: str):
+    await (
+        get_supabase().table(TABLE_NAME)
+        .delete()
+        .or_(_pair(user_a, user_b))
+        .execute()
+    )
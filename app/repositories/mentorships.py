@@ -0,0 +1,83 @@
+# app/repositories/mentorships.py
+from app.db import get_supabase, fetch_all
+from app.models.mentorship import TABLE_NAME
+
+
+async def find_pair(mentor_name: str, mentee_name: str):
+    res = await (
+        get_supabase().table(TABLE_NAME)
+        .select("*")
+        .eq("mentor_name", mentor_name)
+        .eq("mentee_name", mentee_name)
+        .execute()
+    )
+    return res.data[0] if res.data else None
+
+
+async def create(mentor_name: str, mentee_name: str):
+    res = await get_supabase().table(TABLE_NAME).insert({
+        "mentor_name": mentor_name,
+        "mentee_name": mentee_name,
+    }).execute()
+    return res.data[0]
+
+
+async def create_if_absent(mentor_name: str, mentee_name: str):
+    """
+    Insert the pair in one upsert that does nothing on conflict with the
+    unique (mentor_name, mentee_name) constraint, so concurrent requests
+    cannot both insert. Returns the new row, or None if the pair existed.
+    """
+    res = await get_supabase().table(TABLE_NAME).upsert(
+        {"mentor_name": mentor_name, "mentee_name": mentee_name},
+        on_conflict="mentor_name,mentee_name",
+        ignore_duplicates=True
+    ).execute()
+    return res.data[0] if res.data else None
+
+
+async def create_many(pairs):
+    """
+    Insert (mentor_name, mentee_name) pairs in one upsert, skipping pairs
+    that exist; only new rows return.
+    """
+    if not pairs:
+        return []
+    res = await get_supabase().table(TABLE_NAME).upsert(
+        [{"mentor_name": mentor, "mentee_name": mentee} for mentor, mentee in pairs],
+        on_conflict="mentor_name,mentee_name",
+        ignore_duplicates=True
+    ).execute()
+    return res.data
+
+
+async def for_mentees(mentee_names):
+    """Every (mentor_name, mentee_name) pair of the given mentees, paged past the max-rows cap."""
+    if not mentee_names:
+        return []
+    mentee_names = list(mentee_names)
+    return await fetch_all(
+        lambda: get_supabase().table(TABLE_NAME).select("mentor_name, mentee_name")
+        .in_("mentee_name", mentee_names)
+        .order("mentee_name").order("mentor_name")
+    )
+
+
+async def list_all():
+    res = await get_supabase().table(TABLE_NAME).select("*").execute()
+    return res.data
+
+
+async def get(mentorship_id: str):
+    res = await get_supabase().table(TABLE_NAME).select("*").eq("mentorship_id", mentorship_id).execute()
+    return res.data[0] if res.data else None
+
+
+async def update(mentorship_id: str, updates: dict):
+    res = await get_supabase().table(TABLE_NAME).update(updates).eq("mentorship_id", mentorship_id).execute()
+    return res.data
+
+
+async def delete(mentorship_id: str):
+    res = await get_supabase().table(TABLE_NAME).delete().eq("mentorship_id", mentorship_id).execute()
+    return res.data
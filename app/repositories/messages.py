@@ -0,0 +1,124 @@
+# app/repositories/messages.py
+import re
+from datetime import datetime
+
+from app.db import get_supabase, quote
+from app.models.messages import TABLE_NAME
+
+_FRACTION = re.compile(r"\.(\d+)")
+
+
+def _between(user_a: str, user_b: str) -> str:
+    a, b = quote(user_a), quote(user_b)
+    return (
+        f"and(from_user.eq.{a},to_user.eq.{b}),"
+        f"and(from_user.eq.{b},to_user.eq.{a})"
+    )
+
+
+def parse_message_id(value) -> int:
+    """A client-supplied message id as an int; ValueError otherwise."""
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"message id must be an integer, got {value!r}")
+    return int(value)
+
+
+def parse_cursor(cursor) -> tuple:
+    """
+    (created_at, id) of a client-supplied {"created_at", "id"} cursor,
+    re-serialized from a parsed datetime and int so nothing the client
+    sent reaches the filter verbatim. Raises ValueError when malformed.
+    """
+    if not isinstance(cursor, dict) or "created_at" not in cursor or "id" not in cursor:
+        raise ValueError('cursor must be {"created_at": ISO timestamp, "id": integer}')
+    created_at = cursor["created_at"]
+    if not isinstance(created_at, str):
+        raise ValueError(f"cursor created_at must be an ISO timestamp, got {created_at!r}")
+    # Postgres trims fractional zeros and may send "Z"; fromisoformat wants 6 digits and an offset
+    normalized = _FRACTION.sub(lambda m: "." + m.group(1)[:6].ljust(6, "0"), created_at.replace("Z", "+00:00"), 1)
+    return datetime.fromisoformat(normalized).isoformat(), parse_message_id(cursor["id"])
+
+
+def _cursor(op: str, cursor: dict) -> str:
+    """Keyset condition on (created_at, id); timestamps are quoted for PostgREST."""
+    created_at, message_id = parse_cursor(cursor)
+    return (
+        f'or(created_at.{op}."{created_at}",'
+        f'and(created_at.eq."{created_at}",id.{op}.{message_id}))'
+    )
+
+
+async def history_page(user_a: str, user_b: str, before: dict = None, after: dict = None, limit: int = 50):
+    """
+    One page of the conversation between two users, keyed on
+    (created_at, id). With `after`, the messages right after the cursor,
+    oldest first; otherwise the newest messages (older than `before`
+    when given), newest first.
+    """
+    conversation = f"or({_between(user_a, user_b)})"
+    cursor = before or after
+    condition = (
+        f"and({conversation},{_cursor('gt' if after else 'lt', cursor)})"
+        if cursor else conversation
+    )
+    desc = after is None
+
+    res = await (
+        get_supabase().table(TABLE_NAME)
+        .select("*")
+        .or_(condition)
+        .order("created_at", desc=desc)
+        .order("id", desc=desc)
+        .limit(limit)
+        .execute()
+    )
+    return res.data or []
+
+
+async def since(username: str, last_seen_id, with_user: str = None, limit: int = 200):
+    """
+    Messages newer than the client's last-seen id, oldest first, in one
+    conversation or (without with_user) across all of the user's.
+    """
+    query = get_supabase().table(TABLE_NAME).select("*").gt("id", parse_message_id(last_seen_id))
+    if with_user:
+        query = query.or_(_between(username, with_user))
+    else:
+        query = query.or_(f"from_user.eq.{quote(username)},to_user.eq.{quote(username)}")
+    res = await query.order("id", desc=False).limit(limit).execute()
+    return res.data or []
+
+
+async def create(from_user: str, to_user: str, text: str):
+    res = await get_supabase().table(TABLE_NAME).insert({
+        "from_user": from_user,
+        "to_user": to_user,
+        "message": text
+    }).execute()
+    return res.data[0] if res.data else {}
+
+
+async def create_many(rows):
+    """
+    Multi-row insert in one request; the stored rows (with their ids)
+    come back in the order given.
+    """
+    if not rows:
+        return []
+    res = await get_supabase().table(TABLE_NAME).insert(rows).execute()
+    return res.data or []
+
+
+async def mark_read(from_user: str, to_user: str):
+    await (
+        get_supabase().table(TABLE_NAME)
+        .update({"read": True})
+        .eq("from_user", from_user)
+        .eq("to_user", to_user)
+        .eq("read", False)
+        .execute()
+    )
+
+
+async def delete_conversation(user_a: str, user_b: str):
+    await get_supabase().table(TABLE_NAME).delete().or_(_between(user_a, user_b)).execute()
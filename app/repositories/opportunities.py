@@ -0,0 +1,64 @@
+# app/repositories/opportunities.py
+from app.db import get_supabase, fetch_all
+from app.models.opportunities import TABLE_NAME
+from app.models.opportunity_skills import TABLE_NAME as SKILLS_TABLE
+
+
+async def create(row: dict):
+    res = await get_supabase().table(TABLE_NAME).insert(row).execute()
+    return res.data[0]
+
+
+async def list_all():
+    return await fetch_all(
+        lambda: get_supabase().table(TABLE_NAME).select("*").order("opp_id")
+    )
+
+
+async def list_skill_links():
+    """Every (opp_id, skill_id) link, paged past the max-rows cap."""
+    return await fetch_all(
+        lambda: get_supabase().table(SKILLS_TABLE).select("opp_id, skill_id")
+        .order("opp_id").order("skill_id")
+    )
+
+
+async def get(opp_id: str):
+    res = await get_supabase().table(TABLE_NAME).select("*").eq("opp_id", opp_id).execute()
+    return res.data[0] if res.data else None
+
+
+async def update(opp_id: str, updates: dict):
+    res = await get_supabase().table(TABLE_NAME).update(updates).eq("opp_id", opp_id).execute()
+    return res.data
+
+
+async def delete(opp_id: str):
+    res = await get_supabase().table(TABLE_NAME).delete().eq("opp_id", opp_id).execute()
+    return res.data
+
+
+async def existing_skill_ids(opp_id: str, skill_ids):
+    """The subset of skill_ids already linked to the opportunity."""
+    if not skill_ids:
+        return set()
+    res = await (
+        get_supabase().table(SKILLS_TABLE)
+        .select("skill_id")
+        .eq("opp_id", opp_id)
+        .in_("skill_id", list(skill_ids))
+        .execute()
+    )
+    return {row["skill_id"] for row in res.data}
+
+
+async def add_skills(opp_id: str, skill_ids):
+    """Link every skill in one multi-row upsert, skipping existing links."""
+    if not skill_ids:
+        return []
+    res = await get_supabase().table(SKILLS_TABLE).upsert(
+        [{"opp_id": opp_id, "skill_id": skill_id} for skill_id in skill_ids],
+        on_conflict="opp_id,skill_id",
+        ignore_duplicates=True
+    ).execute()
+    return res.data
@@ -0,0 +1,41 @@
+# app/repositories/skills.py
+from app.db import get_supabase
+from app.models.skills import TABLE_NAME
+
+
+async def list_skills():
+    res = await get_supabase().table(TABLE_NAME).select("*").execute()
+    return res.data
+
+
+async def get_by_name(name: str):
+    res = await get_supabase().table(TABLE_NAME).select("*").eq("name", name).execute()
+    return res.data[0] if res.data else None
+
+
+async def get_by_names(names):
+    """Skill rows for every known name, resolved with one in_ query."""
+    if not names:
+        return []
+    res = await get_supabase().table(TABLE_NAME).select("*").in_("name", list(names)).execute()
+    return res.data
+
+
+async def get_by_id(skill_id):
+    res = await get_supabase().table(TABLE_NAME).select("*").eq("skill_id", skill_id).execute()
+    return res.data[0] if res.data else None
+
+
+async def create(row: dict):
+    res = await get_supabase().table(TABLE_NAME).insert(row).execute()
+    return res.data
+
+
+async def update(name: str, updates: dict):
+    res = await get_supabase().table(TABLE_NAME).update(updates).eq("name", name).execute()
+    return res.data
+
+
+async def delete(name: str):
+    res = await get_supabase().table(TABLE_NAME).delete().eq("name", name).execute()
+    return res.data
@@ -0,0 +1,93 @@
+# app/repositories/user_skills.py
+from app.db import get_supabase, fetch_all
+from app.models.user_skills import TABLE_NAME
+from app.models.skills import TABLE_NAME as SKILLS_TABLE
+
+
+async def list_all():
+    """Every (user_id, skill_id) assignment, paged past the max-rows cap."""
+    return await fetch_all(
+        lambda: get_supabase().table(TABLE_NAME).select("user_id, skill_id")
+        .order("user_id").order("skill_id")
+    )
+
+
+async def list_for_user(user_id):
+    res = await get_supabase().table(TABLE_NAME).select("skill_id").eq("user_id", user_id).execute()
+    return res.data
+
+
+async def skills_for_user(user_id):
+    """Full skill rows held by a user, embedded in one joined select."""
+    res = await (
+        get_supabase().table(TABLE_NAME)
+        .select(f"{SKILLS_TABLE}(*)")
+        .eq("user_id", user_id)
+        .execute()
+    )
+    return [row[SKILLS_TABLE] for row in res.data if row.get(SKILLS_TABLE)]
+
+
+async def existing_skill_ids(user_id, skill_ids):
+    """The subset of skill_ids already mapped to the user."""
+    if not skill_ids:
+        return set()
+    res = await (
+        get_supabase().table(TABLE_NAME)
+        .select("skill_id")
+        .eq("user_id", user_id)
+        .in_("skill_id", list(skill_ids))
+        .execute()
+    )
+    return {row["skill_id"] for row in res.data}
+
+
+async def create_many(user_id, skill_ids):
+    """
+    Insert every mapping in one multi-row upsert. Rows that already
+    exist are skipped (on conflict do nothing), so only new rows return.
+    """
+    if not skill_ids:
+        return []
+    res = await get_supabase().table(TABLE_NAME).upsert(
+        [{"user_id": user_id, "skill_id": skill_id} for skill_id in skill_ids],
+        on_conflict="user_id,skill_id",
+        ignore_duplicates=True
+    ).execute()
+    return res.data
+
+
+async def create_rows(rows):
+    """
+    Multi-row upsert of (user_id, skill_id) rows for any number of
+    users, skipping existing mappings; only new rows return.
+    """
+    if not rows:
+        return []
+    res = await get_supabase().table(TABLE_NAME).upsert(
+        rows, on_conflict="user_id,skill_id", ignore_duplicates=True
+    ).execute()
+    return res.data
+
+
+async def for_users(user_ids):
+    """Every (user_id, skill_id) mapping of the given users, paged past the max-rows cap."""
+    if not user_ids:
+        return []
+    user_ids = list(user_ids)
+    return await fetch_all(
+        lambda: get_supabase().table(TABLE_NAME).select("user_id, skill_id")
+        .in_("user_id", user_ids)
+        .order("user_id").order("skill_id")
+    )
+
+
+async def delete(user_id, skill_id):
+    res = await (
+        get_supabase().table(TABLE_NAME)
+        .delete()
+        .eq("user_id", user_id)
+        .eq("skill_id", skill_id)
+        .execute()
+    )
+    return res.data
@@ -0,0 +1,49 @@
+# app/repositories/users.py
+from app.db import get_supabase, fetch_all
+from app.models.users import TABLE_NAME
+
+
+async def get_by_username(username: str, columns: str = "*"):
+    """
+    Fetch a single user by username.
+    Returns a dict (the user row) or None if not found.
+    """
+    res = await get_supabase().table(TABLE_NAME).select(columns).eq("username", username).execute()
+    return res.data[0] if res.data else None
+
+
+async def list_users(columns: str = "*", role: str = None):
+    def query():
+        q = get_supabase().table(TABLE_NAME).select(columns)
+        if role:
+            q = q.eq("role", role)
+        return q.order("user_id")
+    return await fetch_all(query)
+
+
+async def roles_of(usernames):
+    """username -> role for every username that exists, in one in_ query."""
+    if not usernames:
+        return {}
+    res = await (
+        get_supabase().table(TABLE_NAME)
+        .select("username, role")
+        .in_("username", list(usernames))
+        .execute()
+    )
+    return {row["username"]: row["role"] for row in res.data}
+
+
+async def create(row: dict):
+    res = await get_supabase().table(TABLE_NAME).insert(row).execute()
+    return res.data
+
+
+async def update(username: str, updates: dict):
+    res = await get_supabase().table(TABLE_NAME).update(updates).eq("username", username).execute()
+    return res.data
+
+
+async def delete(username: str):
+    res = await get_supabase().table(TABLE_NAME).delete().eq("username", username).execute()
+    return res.data
@@ -0,0 +1,360 @@
+import csv
+import io
+import json
+import os
+import time
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+
+from app.db import iter_pages
+from app.models.users import TABLE_NAME as USERS_TABLE, PRIMARY_KEY, PUBLIC_COLUMNS
+from app.schemas.user_schema import UserCreate
+from app.routes.skills import get_skills_by_names
+from app.ml.skill_index import skill_index
+from app.utils.auth import require_admin
+from app.utils.hashing import hash_passwords_async
+from app.utils.cache import user_cache
+from app.utils.message_writer import is_transient
+from app.repositories import users as users_repo
+from app.repositories import skills as skills_repo
+from app.repositories import user_skills as user_skills_repo
+from app.repositories import mentorships as mentorships_repo
+
+# imports create accounts and exports every profile: admins only
+router = APIRouter(prefix="/bulk", tags=["Bulk"], dependencies=[Depends(require_admin)])
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+# error rows returned in the report; the counts always cover every row
+MAX_REPORTED_ERRORS = int(os.getenv("MAX_REPORTED_ERRORS", "1000"))
+
+USER_FIELDS = (
+    "username", "name", "password", "role",
+    "phone_number", "experience_level", "profile_summary"
+)
+# one row per user; skills and mentors are lists (";"-separated in CSV)
+EXPORT_COLUMNS = (
+    "username", "name", "role", "phone_number",
+    "experience_level", "profile_summary", "skills", "mentors"
+)
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.users_created = 0
+        self.skills_assigned = 0
+        self.mentorships_created = 0
+        self.failed = set()
+        self.errors = []
+
+    def error(self, row: int, username, message: str):
+        self.failed.add(row)
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "username": username, "error": message})
+
+
+# ---------------- PARSING ----------------
+async def _lines(request: Request):
+    """Decoded lines of the request body, as it streams in."""
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8", errors="replace").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8", errors="replace").rstrip("\r")
+
+
+async def _records(request: Request, format: str):
+    """
+    Yield (row number, record, error) per non-empty line. CSV needs a
+    header line and one record per line (no newlines inside fields).
+    """
+    header = None
+    row = 0
+    async for line in _lines(request):
+        if not line.strip():
+            continue
+        if format == "csv":
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [h.strip() for h in values]
+                continue
+            row += 1
+            if len(values) != len(header):
+                yield row, None, f"Expected {len(header)} columns, got {len(values)}"
+            else:
+                yield row, dict(zip(header, values)), None
+        else:
+            row += 1
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield row, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield row, None, "Expected a JSON object"
+            else:
+                yield row, record, None
+
+
+def _list_field(value):
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [v.strip() for v in str(value).split(";") if v.strip()]
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors()
+    )
+
+
+# ---------------- IMPORT ----------------
+async def _insert_isolating(insert, batch, report: ImportReport):
+    """
+    insert() the data of a batch of (row, username, data, error prefix)
+    in one call. When the database rejects it, the halves are retried
+    down to single rows, so only the rows it rejects are reported (one
+    bad row costs about 2 * log2(len(batch)) inserts). A transient
+    error fails the batch as is. Returns the inserted rows.
+    """
+    try:
+        return await insert([data for _, _, data, _ in batch])
+    except Exception as e:
+        if len(batch) == 1 or is_transient(e):
+            for row, username, _, message in batch:
+                report.error(row, username, f"{message}: {e}")
+            return []
+    mid = len(batch) // 2
+    return (
+        await _insert_isolating(insert, batch[:mid], report)
+        + await _insert_isolating(insert, batch[mid:], report)
+    )
+
+
+async def _import_chunk(chunk, report: ImportReport, seen: set, imported_roles: dict, pairings: list):
+    # 1. Validate every row; CSV leaves missing values as ""
+    valid = []
+    for row, record, error in chunk:
+        if error:
+            report.error(row, None, error)
+            continue
+        username = record.get("username")
+        try:
+            user = UserCreate(**{f: record.get(f) if record.get(f) != "" else None for f in USER_FIELDS})
+        except ValidationError as e:
+            report.error(row, username, _validation_message(e))
+            continue
+        if user.username in seen:
+            report.error(row, user.username, "Duplicate username in file")
+            continue
+        seen.add(user.username)
+        mentors = _list_field(record.get("mentors"))
+        if mentors and user.role != "mentee":
+            report.error(row, user.username, "Only mentees can list mentors")
+            continue
+        valid.append((row, user, _list_field(record.get("skills")), mentors))
+
+    # 2. Usernames already taken and skill names, one query each for the chunk
+    taken = await users_repo.roles_of([user.username for _, user, _, _ in valid])
+    skills = await get_skills_by_names({name for _, _, names, _ in valid for name in names})
+
+    accepted = []
+    for row, user, skill_names, mentors in valid:
+        if user.username in taken:
+            report.error(row, user.username, "Username already taken")
+            continue
+        missing = [name for name in skill_names if name not in skills]
+        if missing:
+            report.error(row, user.username, f"Skill '{missing[0]}' does not exist")
+            continue
+        accepted.append((row, user, skill_names, mentors))
+    if not accepted:
+        return
+
+    # 3. Hash the chunk's passwords on its share of the worker pool
+    try:
+        hashes = await hash_passwords_async([user.password for _, user, _, _ in accepted])
+    except HTTPException as e:
+        for row, user, _, _ in accepted:
+            report.error(row, user.username, str(e.detail))
+        return
+
+    # 4. One multi-row insert for the chunk's users; rejected rows are isolated
+    created = await _insert_isolating(users_repo.create, [
+        (row, user.username, {
+            "username": user.username,
+            "name": user.name,
+            "password_hash": hashed,
+            "role": user.role,
+            "phone_number": user.phone_number,
+            "experience_level": user.experience_level,
+            "profile_summary": user.profile_summary
+        }, "Insert failed")
+        for (row, user, _, _), hashed in zip(accepted, hashes)
+    ], report)
+    if not created:
+        return
+
+    user_ids = {}
+    for row in created:
+        skill_index.put_user(row)
+        user_ids[row["username"]] = row["user_id"]
+        imported_roles[row["username"]] = row["role"]
+    report.users_created += len(created)
+    # drop negative entries cached for the (then unknown) usernames
+    await user_cache.invalidate(*user_ids)
+
+    # 5. One multi-row upsert for every user-skill mapping of the chunk
+    assignments = {}
+    for row, user, skill_names, _ in accepted:
+        if user.username in user_ids:
+            for name in skill_names:
+                key = (user_ids[user.username], skills[name]["skill_id"])
+                assignments[key] = (
+                    row, user.username, {"user_id": key[0], "skill_id": key[1]},
+                    f"User created, skill '{name}' not assigned"
+                )
+    inserted = await _insert_isolating(user_skills_repo.create_rows, list(assignments.values()), report)
+    by_user = {}
+    for row in inserted:
+        by_user.setdefault(row["user_id"], []).append(row["skill_id"])
+    for user_id, skill_ids in by_user.items():
+        skill_index.add_user_skills(user_id, skill_ids)
+    report.skills_assigned += len(inserted)
+
+    # Pairings wait until every user is in: a mentor may come later in the file
+    for row, user, _, mentors in accepted:
+        if user.username not in user_ids:
+            continue
+        for mentor in mentors:
+            pairings.append((row, mentor, user.username))
+
+
+async def _import_pairings(pairings, report: ImportReport, imported_roles: dict):
+    roles = dict(imported_roles)
+    unknown = list({mentor for _, mentor, _ in pairings if mentor not in roles})
+    for i in range(0, len(unknown), BULK_CHUNK_SIZE):
+        roles.update(await users_repo.roles_of(unknown[i:i + BULK_CHUNK_SIZE]))
+
+    pairs = []
+    for row, mentor, mentee in pairings:
+        if mentor not in roles:
+            report.error(row, mentee, f"Mentor '{mentor}' does not exist")
+        elif roles[mentor] != "mentor":
+            report.error(row, mentee, f"User '{mentor}' is not a mentor")
+        elif mentor == mentee:
+            report.error(row, mentee, "User cannot mentor themselves")
+        else:
+            pairs.append((row, mentor, mentee))
+
+    for i in range(0, len(pairs), BULK_CHUNK_SIZE):
+        created = await _insert_isolating(
+            mentorships_repo.create_many,
+            [
+                (row, mentee, (mentor, mentee), f"User created, mentorship with '{mentor}' failed")
+                for row, mentor, mentee in pairs[i:i + BULK_CHUNK_SIZE]
+            ],
+            report
+        )
+        report.mentorships_created += len(created)
+
+
+@router.post("/import")
+async def bulk_import(request: Request, format: Literal["csv", "ndjson"] = None):
+    """
+    Import users with their skills and mentors from a streamed CSV or
+    NDJSON body, one user per row: the UserCreate fields plus optional
+    `skills` and (for mentees) `mentors`, lists or ";"-separated.
+    Rows are validated, hashed and inserted BULK_CHUNK_SIZE at a time;
+    bad rows are reported and skipped, the rest are imported.
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "csv" if "csv" in content_type else "ndjson"
+
+    start = time.perf_counter()
+    report = ImportReport()
+    seen, imported_roles, pairings = set(), {}, []
+
+    chunk = []
+    async for record in _records(request, format):
+        report.rows += 1
+        chunk.append(record)
+        if len(chunk) == BULK_CHUNK_SIZE:
+            await _import_chunk(chunk, report, seen, imported_roles, pairings)
+            chunk = []
+    if chunk:
+        await _import_chunk(chunk, report, seen, imported_roles, pairings)
+    await _import_pairings(pairings, report, imported_roles)
+
+    seconds = time.perf_counter() - start
+    return {
+        "rows": report.rows,
+        "users_created": report.users_created,
+        "skills_assigned": report.skills_assigned,
+        "mentorships_created": report.mentorships_created,
+        "failed_rows": len(report.failed),
+        "errors": report.errors,
+        "seconds": seconds,
+        "rows_per_second": report.rows / seconds if seconds else None,
+    }
+
+
+# ---------------- EXPORT ----------------
+def _export_row(user, skill_names, mentors):
+    return {
+        **{c: user.get(c) for c in EXPORT_COLUMNS[:-2]},
+        "skills": skill_names,
+        "mentors": mentors,
+    }
+
+
+async def _export(format: str):
+    skill_names = {s["skill_id"]: s["name"] for s in await skills_repo.list_skills()}
+    if format == "csv":
+        yield ",".join(EXPORT_COLUMNS) + "\n"
+
+    # one page of users (plus their skills and mentors) in memory at a time
+    async for users in iter_pages(USERS_TABLE, PRIMARY_KEY, ", ".join(PUBLIC_COLUMNS), page_size=BULK_CHUNK_SIZE):
+        skills_of, mentors_of = {}, {}
+        for row in await user_skills_repo.for_users([u["user_id"] for u in users]):
+            skills_of.setdefault(row["user_id"], []).append(skill_names.get(row["skill_id"]))
+        for row in await mentorships_repo.for_mentees([u["username"] for u in users]):
+            mentors_of.setdefault(row["mentee_name"], []).append(row["mentor_name"])
+
+        rows = [
+            _export_row(u, skills_of.get(u["user_id"], []), mentors_of.get(u["username"], []))
+            for u in users
+        ]
+        if format == "csv":
+            out = io.StringIO()
+            writer = csv.writer(out, lineterminator="\n")
+            for row in rows:
+                writer.writerow([
+                    ";".join(n for n in row[c] if n) if c in ("skills", "mentors")
+                    else (row[c] if row[c] is not None else "")
+                    for c in EXPORT_COLUMNS
+                ])
+            yield out.getvalue()
+        else:
+            yield "".join(json.dumps(row, default=str) + "\n" for row in rows)
+
+
+@router.get("/export")
+async def bulk_export(format: Literal["csv", "ndjson"] = "ndjson"):
+    """
+    Stream every user with their skills and mentors, in the import row
+    format (without passwords), page by page.
+    """
+    return StreamingResponse(
+        _export(format),
+        media_type="text/csv" if format == "csv" else "application/x-ndjson"
+    )
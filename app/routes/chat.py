@@ -1,138 +1,534 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from typing import Dict, List
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException
+from typing import Dict, List, Optional, Set
+import asyncio
 import json
-from datetime import datetime
-from app.db import get_supabase
+import os
+import time
+from uuid import uuid4
+from app.repositories import messages as messages_repo
+from app.repositories import conversations as conversations_repo
+from app.utils.auth import verify_token, get_current_user
+from app.utils.broker import broker, user_channel, presence_channel, PRESENCE_HEARTBEAT
+from app.utils.coalesce import TypingCoalescer
+from app.utils.wire import negotiate
+from app.utils.message_writer import message_writer
 
 router = APIRouter(prefix="/ws", tags=["WebSocket Chat"])
 
+SOCKET_QUEUE_SIZE = int(os.getenv("SOCKET_QUEUE_SIZE", "256"))
+SLOW_CONSUMER_POLICY = os.getenv("SLOW_CONSUMER_POLICY", "drop")   # drop | close
+MAX_PRESENCE_SUBSCRIPTIONS = int(os.getenv("MAX_PRESENCE_SUBSCRIPTIONS", "500"))
+# event types counted by name in frames_received; anything else is "other",
+# so clients cannot grow the counter (and its metric labels) without bound
+KNOWN_EVENTS = (
+    "get_history", "sync_since", "message", "typing", "check_online",
+    "subscribe_presence", "unsubscribe_presence", "get_conversations",
+    "mark_read", "delete_conversation", "ping",
+)
+
+class ClientConnection:
+    """
+    One open socket. Outbound frames go through a bounded queue drained
+    by the socket's own task, so a slow client never stalls the receive
+    loop of whoever is sending to it. When the queue is full, pushed
+    frames are dropped, or with SLOW_CONSUMER_POLICY=close the socket
+    is closed (1013, try again later) so the client reconnects and syncs.
+    """
+
+    def __init__(self, username: str, websocket: WebSocket, codec):
+        self.username = username
+        self.websocket = websocket
+        self.codec = codec          # JSON or MessagePack, negotiated at accept
+        self.queue = asyncio.Queue(maxsize=SOCKET_QUEUE_SIZE)
+        self.sent = 0
+        self.dropped = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.closing = False
+        self.watching = set()       # users whose presence changes this socket receives
+        self._task = None
+        self._closer = None
+    
+    def start(self):
+        self._task = asyncio.create_task(self._drain())
+    
+    async def _drain(self):
+        while True:
+            message, queued_at = await self.queue.get()
+            try:
+                await self.codec.send(self.websocket, message)
+            except Exception as e:
+                # the receive loop sees the disconnect and cleans up
+                print(f"Error sending to {self.username}: {e}")
+                return
+            latency = time.perf_counter() - queued_at
+            self.sent += 1
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+    
+    def push(self, message: dict) -> bool:
+        """Queue a frame for someone else's event without waiting; False if dropped"""
+        try:
+            self.queue.put_nowait((message, time.perf_counter()))
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if SLOW_CONSUMER_POLICY == "close" and not self.closing:
+                self.closing = True
+                self._closer = asyncio.create_task(self._close_slow())
+            return False
+    
+    async def receive(self) -> dict:
+        return await self.codec.receive(self.websocket)
+    
+    async def send(self, message: dict):
+        """Queue a reply to this client's own request, waiting for room"""
+        if self._task is None or self._task.done():
+            raise RuntimeError(f"connection to {self.username} is closed")
+        await self.queue.put((message, time.perf_counter()))
+    
+    async def _close_slow(self):
+        print(f"⚠️ Closing slow consumer {self.username} ({self.queue.qsize()} frames queued)")
+        try:
+            await self.websocket.close(code=1013)
+        except Exception:
+            pass
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def stats(self):
+        return {
+            "username": self.username,
+            "protocol": "msgpack" if self.codec.binary else "json",
+            "queue_depth": self.queue.qsize(),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "avg_send_latency_ms": 1000 * self.latency_total / self.sent if self.sent else 0.0,
+            "max_send_latency_ms": 1000 * self.latency_max,
+        }
+
 # Store active connections
 class ConnectionManager:
+    """
+    Sockets held by this worker, any number per user (one per tab or
+    device). Delivery and presence go through the chat broker, so a
+    user connected to another worker (or pod) is reachable and
+    reported online too.
+    """
+
     def __init__(self):
-        # Format: {username: WebSocket}
-        self.active_connections: Dict[str, WebSocket] = {}
+        # Format: {username: {ClientConnection}}
+        self.active_connections: Dict[str, Set[ClientConnection]] = {}
+        # Format: {watched username: {ClientConnection}}
+        self._watchers: Dict[str, Set[ClientConnection]] = {}
+        self._presence_seen: Dict[str, bool] = {}   # last state pushed to local watchers
+        self._heartbeat_task = None
+        # counters of connections that have since closed
+        self._closed = {"sent": 0, "dropped": 0, "latency_total": 0.0, "latency_max": 0.0}
+        self.connections_opened = 0
+        self.frames_received = {}   # event type -> count
     
-    async def connect(self, username: str, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections[username] = websocket
-        print(f"✅ {username} connected. Total: {len(self.active_connections)}")
+    async def connect(self, username: str, websocket: WebSocket) -> ClientConnection:
+        codec = negotiate(websocket.scope.get("subprotocols"))
+        await websocket.accept(subprotocol=codec.subprotocol)
+        connection = ClientConnection(username, websocket, codec)
+        connection.start()
+        self.connections_opened += 1
+        first = username not in self.active_connections
+        self.active_connections.setdefault(username, set()).add(connection)
+        if first:
+            await broker.subscribe(user_channel(username), lambda message: self._deliver(message, username))
+        # online is published by whichever heartbeat finds the user offline
+        await self._refresh_presence([username])
+        print(f"✅ {username} connected. Total: {self.socket_count()}")
+        return connection
     
-    def disconnect(self, username: str):
-        if username in self.active_connections:
-            del self.active_connections[username]
-        print(f"❌ {username} disconnected. Total: {len(self.active_connections)}")
+    async def disconnect(self, username: str, connection: ClientConnection):
+        connections = self.active_connections.get(username)
+        if connections is not None and connection in connections:
+            connections.discard(connection)
+            await connection.stop()
+            await self.unwatch(connection, list(connection.watching))
+            self._closed["sent"] += connection.sent
+            self._closed["dropped"] += connection.dropped
+            self._closed["latency_total"] += connection.latency_total
+            self._closed["latency_max"] = max(self._closed["latency_max"], connection.latency_max)
+            if not connections:
+                # last socket of this user on this worker
+                del self.active_connections[username]
+                try:
+                    await broker.unsubscribe(user_channel(username))
+                    # offline only once no worker holds a socket for the user
+                    if await broker.leave(username):
+                        await self._publish_presence(username, False)
+                except Exception as e:
+                    print(f"Error leaving broker for {username}: {e}")
+        print(f"❌ {username} disconnected. Total: {self.socket_count()}")
+    
+    async def _deliver(self, message: dict, username: str):
+        """Queue a frame on every socket this worker holds for the user"""
+        for connection in list(self.active_connections.get(username, ())):
+            connection.push(message)
     
     async def send_personal_message(self, message: dict, username: str):
-        """Send message to a specific user"""
+        """
+        Send message to a specific user, on every worker holding one of
+        their sockets; this worker is subscribed to the channel too.
+        """
+        try:
+            await broker.publish(user_channel(username), message)
+        except Exception as e:
+            print(f"Error publishing to {username}: {e}")
+    
+    async def is_online(self, username: str) -> bool:
+        """Check if user is currently connected to any worker"""
         if username in self.active_connections:
+            return True
+        return bool(await broker.online([username]))
+    
+    async def online(self, usernames) -> set:
+        """The given users that are connected to any worker, in one lookup"""
+        return await broker.online(usernames)
+    
+    async def online_users(self) -> List[str]:
+        return await broker.all_online()
+    
+    # ---------------- PRESENCE SUBSCRIPTIONS ----------------
+    async def watch(self, connection: ClientConnection, usernames) -> Dict[str, bool]:
+        """
+        Subscribe a socket to presence changes of the given users and
+        return their current state; from then on only diffs are pushed.
+        """
+        room = MAX_PRESENCE_SUBSCRIPTIONS - len(connection.watching)
+        usernames = list(dict.fromkeys(usernames))
+        new = [u for u in usernames if u not in connection.watching][:max(room, 0)]
+        online = await broker.online(usernames)
+        for user in new:
+            connection.watching.add(user)
+            if user not in self._watchers:
+                self._watchers[user] = set()
+                self._presence_seen[user] = user in online
+                await broker.subscribe(presence_channel(user), self._presence_changed)
+            self._watchers[user].add(connection)
+        return {user: user in online for user in usernames}
+    
+    async def unwatch(self, connection: ClientConnection, usernames):
+        for user in usernames:
+            connection.watching.discard(user)
+            watchers = self._watchers.get(user)
+            if watchers is None:
+                continue
+            watchers.discard(connection)
+            if not watchers:
+                del self._watchers[user]
+                self._presence_seen.pop(user, None)
+                try:
+                    await broker.unsubscribe(presence_channel(user))
+                except Exception as e:
+                    print(f"Error unsubscribing presence of {user}: {e}")
+    
+    async def _publish_presence(self, username: str, online: bool):
+        try:
+            await broker.publish(presence_channel(username), {"user": username, "online": online})
+        except Exception as e:
+            print(f"Error publishing presence of {username}: {e}")
+    
+    async def _presence_changed(self, message: dict):
+        """Push a transition to local watchers, once per actual change"""
+        user, online = message["user"], message["online"]
+        if user not in self._watchers or self._presence_seen.get(user) == online:
+            return
+        self._presence_seen[user] = online
+        for connection in list(self._watchers[user]):
+            connection.push({"type": "presence", "user": user, "online": online})
+    
+    def socket_count(self) -> int:
+        return sum(len(connections) for connections in self.active_connections.values())
+    
+    # ---------------- PRESENCE HEARTBEAT ----------------
+    async def _refresh_presence(self, usernames):
+        """
+        Heartbeat the given users and publish the global transitions the
+        broker reports: users that came online, and users whose presence
+        expired (e.g. their worker crashed), wherever they were connected.
+        """
+        came_online, went_offline = await broker.heartbeat(usernames)
+        for user in came_online:
+            await self._publish_presence(user, True)
+        for user in went_offline:
+            await self._publish_presence(user, False)
+    
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(PRESENCE_HEARTBEAT)
             try:
-                await self.active_connections[username].send_json(message)
+                await self._refresh_presence(list(self.active_connections))
             except Exception as e:
-                print(f"Error sending to {username}: {e}")
-                self.disconnect(username)
+                print(f"Presence heartbeat failed: {e}")
+    
+    async def start(self):
+        await broker.start()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
     
-    def is_online(self, username: str) -> bool:
-        """Check if user is currently connected"""
-        return username in self.active_connections
+    async def stop(self):
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+        await broker.close()
+    
+    # ---------------- STATS ----------------
+    def stats(self, lagging: int = 20):
+        connections = [c for cs in self.active_connections.values() for c in cs]
+        sent = self._closed["sent"] + sum(c.sent for c in connections)
+        latency_total = self._closed["latency_total"] + sum(c.latency_total for c in connections)
+        latency_max = max([self._closed["latency_max"]] + [c.latency_max for c in connections])
+        by_depth = sorted(connections, key=lambda c: (c.queue.qsize(), c.dropped), reverse=True)
+        return {
+            "users": len(self.active_connections),
+            "sockets": len(connections),
+            "connections_opened": self.connections_opened,
+            "frames_received": dict(self.frames_received),
+            "queue_size": SOCKET_QUEUE_SIZE,
+            "slow_consumer_policy": SLOW_CONSUMER_POLICY,
+            "sent": sent,
+            "dropped": self._closed["dropped"] + sum(c.dropped for c in connections),
+            "queued": sum(c.queue.qsize() for c in connections),
+            "avg_send_latency_ms": 1000 * latency_total / sent if sent else 0.0,
+            "max_send_latency_ms": 1000 * latency_max,
+            "lagging": [c.stats() for c in by_depth[:lagging] if c.queue.qsize() or c.dropped],
+            "presence_watched": len(self._watchers),
+            "typing": typing_coalescer.stats(),
+        }
 
 manager = ConnectionManager()
 
+async def _send_typing(from_user: str, to_user: str, is_typing: bool):
+    await manager.send_personal_message({
+        "type": "typing",
+        "from_user": from_user,
+        "is_typing": is_typing
+    }, to_user)
+
+typing_coalescer = TypingCoalescer(_send_typing)
+
+HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 200
+
+def _page_size(requested, default: int = HISTORY_PAGE_SIZE) -> int:
+    try:
+        return max(1, min(int(requested), MAX_HISTORY_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return default
+
+# keeps pending acks referenced until they complete
+_ack_tasks = set()
+
+async def _ack_when_persisted(connection: ClientConnection, response: dict, persisted, status: str):
+    try:
+        saved = await persisted
+    except Exception as e:
+        print(f"Error storing message: {e}")
+        try:
+            await connection.send({
+                "type": "error",
+                "temp_id": response["temp_id"],
+                "message": f"Failed to send message: {str(e)}"
+            })
+        except Exception:
+            pass
+        return
+
+    ack = {
+        **response,
+        "id": saved.get("id"),
+        "created_at": saved.get("created_at", response["created_at"]),
+        "status": status
+    }
+    try:
+        await connection.send(ack)
+    except Exception as e:
+        print(f"Error acking message to {response['from_user']}: {e}")
+
+    # The recipient got the message before it had an id: send it, so their
+    # last-seen id (the sync_since cursor) can move past this message
+    await manager.send_personal_message({
+        "type": "message_stored",
+        "temp_id": response["temp_id"],
+        "id": ack["id"],
+        "from_user": response["from_user"],
+        "created_at": ack["created_at"]
+    }, response["to_user"])
+
+def _message_cursor(message: dict) -> dict:
+    return {"created_at": message.get("created_at"), "id": message.get("id")}
+
 @router.websocket("/chat/{username}")
-async def websocket_endpoint(websocket: WebSocket, username: str):
-    supabase = get_supabase()
-    await manager.connect(username, websocket)
+async def websocket_endpoint(websocket: WebSocket, username: str, token: Optional[str] = None):
+    # Browsers cannot set headers on a WebSocket, so the JWT comes as ?token=
+    try:
+        claims = verify_token(token or "")
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    if claims.get("username") != username:
+        await websocket.close(code=1008)
+        return
+
+    connection = await manager.connect(username, websocket)
     
     try:
         while True:
             # Receive message from client
-            data = await websocket.receive_json()
+            data = await connection.receive()
             
             message_type = data.get("type")
+            counted = message_type if message_type in KNOWN_EVENTS else "other"
+            manager.frames_received[counted] = manager.frames_received.get(counted, 0) + 1
             
             # ===============================
             # 1. GET CHAT HISTORY
             # ===============================
             if message_type == "get_history":
                 other_user = data.get("with_user")
+                before = data.get("before")    # {"created_at", "id"} of the oldest message shown
+                after = data.get("after")      # {"created_at", "id"} of the newest message shown
+                limit = _page_size(data.get("limit"))
+
+                try:
+                    # Cursors come from the client: parse them before they reach a filter
+                    for cursor in (before, after):
+                        if cursor is not None:
+                            messages_repo.parse_cursor(cursor)
+                except ValueError as e:
+                    await connection.send({
+                        "type": "error",
+                        "message": f"Invalid cursor: {e}"
+                    })
+                    continue
                 
                 try:
-                    # Query messages between these two users
-                    result = supabase.table("messages").select("*").or_(
-                        f"and(from_user.eq.{username},to_user.eq.{other_user}),"
-                        f"and(from_user.eq.{other_user},to_user.eq.{username})"
-                    ).order("created_at", desc=False).execute()
-                    
-                    messages = result.data if result.data else []
+                    # One page of messages between these two users, newest page first
+                    messages = await messages_repo.history_page(
+                        username, other_user, before=before, after=after, limit=limit
+                    )
+                    if not after:
+                        messages.reverse()   # fetched newest first; the client renders oldest first
                     
                     # Send history back to requester
-                    await websocket.send_json({
+                    await connection.send({
                         "type": "history",
                         "with_user": other_user,
                         "messages": messages,
-                        "count": len(messages)
+                        "count": len(messages),
+                        "has_more": len(messages) == limit,
+                        "before": _message_cursor(messages[0]) if messages else before,
+                        "after": _message_cursor(messages[-1]) if messages else after
                     })
                     
                 except Exception as e:
                     print(f"Error fetching history: {e}")
-                    await websocket.send_json({
+                    await connection.send({
                         "type": "error",
                         "message": f"Failed to load history: {str(e)}"
                     })
             
+            # ===============================
+            # 1b. SYNC SINCE LAST-SEEN MESSAGE
+            # ===============================
+            elif message_type == "sync_since":
+                last_seen_id = data.get("last_seen_id")
+                other_user = data.get("with_user")
+                limit = _page_size(data.get("limit"), MAX_HISTORY_PAGE_SIZE)
+
+                if last_seen_id is None:
+                    await connection.send({
+                        "type": "error",
+                        "message": "Missing required field: last_seen_id"
+                    })
+                    continue
+                try:
+                    last_seen_id = messages_repo.parse_message_id(last_seen_id)
+                except ValueError as e:
+                    await connection.send({
+                        "type": "error",
+                        "message": f"Invalid last_seen_id: {e}"
+                    })
+                    continue
+
+                try:
+                    # Only the delta a reconnecting client has not seen yet
+                    messages = await messages_repo.since(
+                        username, last_seen_id, with_user=other_user, limit=limit
+                    )
+                    await connection.send({
+                        "type": "sync",
+                        "with_user": other_user,
+                        "messages": messages,
+                        "count": len(messages),
+                        "has_more": len(messages) == limit,
+                        "last_seen_id": messages[-1]["id"] if messages else last_seen_id
+                    })
+
+                except Exception as e:
+                    print(f"Error syncing messages: {e}")
+                    await connection.send({
+                        "type": "error",
+                        "message": f"Failed to sync messages: {str(e)}"
+                    })
+            
             # ===============================
             # 2. SEND MESSAGE
             # ===============================
             elif message_type == "message":
-                from_user = data.get("from_user", username)
+                # always the socket's verified user; a from_user in the frame is ignored
+                from_user = username
                 to_user = data.get("to_user")
                 text = data.get("text", "")
                 
                 if not to_user or not text:
-                    await websocket.send_json({
+                    await connection.send({
                         "type": "error",
                         "message": "Missing required fields: to_user or text"
                     })
                     continue
                 
-                # Store message in database
-                try:
-                    result = supabase.table("messages").insert({
-                        "from_user": from_user,
-                        "to_user": to_user,
-                        "message": text
-                    }).execute()
-                    
-                    message_data = result.data[0] if result.data else {}
-                    message_id = message_data.get("id")
-                    created_at = message_data.get("created_at", datetime.utcnow().isoformat())
-                    
-                except Exception as e:
-                    print(f"Error storing message: {e}")
-                    await websocket.send_json({
-                        "type": "error",
-                        "message": f"Failed to send message: {str(e)}"
-                    })
-                    continue
+                # Queue for a batched insert; relay without waiting on the database
+                row, persisted = message_writer.submit(from_user, to_user, text)
                 
-                # Prepare response message
+                # Prepare response message (the id follows in a "message_stored" frame after the flush)
                 response = {
                     "type": "message",
-                    "id": message_id,
+                    "id": None,
+                    "temp_id": uuid4().hex,
                     "from_user": from_user,
                     "to_user": to_user,
                     "message": text,
-                    "created_at": created_at
+                    "created_at": row["created_at"]
                 }
                 
-                # Send to recipient if online
-                if manager.is_online(to_user):
+                # Send to recipient if online (on any worker)
+                recipient_online = await manager.is_online(to_user)
+                if recipient_online:
                     await manager.send_personal_message(response, to_user)
                 
-                # Send confirmation back to sender
-                await websocket.send_json({
-                    **response,
-                    "status": "delivered" if manager.is_online(to_user) else "sent"
-                })
+                # Confirm to sender with the stored id once the batch is written
+                task = asyncio.create_task(_ack_when_persisted(
+                    connection, response, persisted,
+                    "delivered" if recipient_online else "sent"
+                ))
+                _ack_tasks.add(task)
+                task.add_done_callback(_ack_tasks.discard)
             
             # ===============================
             # 3. TYPING INDICATOR
@@ -141,12 +537,9 @@ async def websocket_endpoint(websocket: WebSocket, username: str):
                 to_user = data.get("to_user")
                 is_typing = data.get("is_typing", False)
                 
-                if to_user and manager.is_online(to_user):
-                    await manager.send_personal_message({
-                        "type": "typing",
-                        "from_user": username,
-                        "is_typing": is_typing
-                    }, to_user)
+                # Repeated keystroke events are merged per (from, to) pair
+                if to_user:
+                    await typing_coalescer.push(username, to_user, is_typing)
             
             # ===============================
             # 4. GET ONLINE STATUS
@@ -154,52 +547,60 @@ async def websocket_endpoint(websocket: WebSocket, username: str):
             elif message_type == "check_online":
                 users_to_check = data.get("users", [])
                 
+                online = await manager.online(users_to_check)
                 online_status = {
-                    user: manager.is_online(user) 
+                    user: user in online
                     for user in users_to_check
                 }
                 
-                await websocket.send_json({
+                await connection.send({
+                    "type": "online_status",
+                    "users": online_status
+                })
+            
+            # ===============================
+            # 4b. SUBSCRIBE TO PRESENCE CHANGES
+            # ===============================
+            elif message_type == "subscribe_presence":
+                # Current state once, then {"type": "presence"} diffs instead of polling
+                online_status = await manager.watch(connection, data.get("users", []))
+                await connection.send({
                     "type": "online_status",
                     "users": online_status
                 })
             
+            elif message_type == "unsubscribe_presence":
+                await manager.unwatch(connection, data.get("users", []))
+            
             # ===============================
             # 5. GET ALL CONVERSATIONS
             # ===============================
             elif message_type == "get_conversations":
                 try:
-                    # Get all messages involving this user
-                    result = supabase.table("messages").select(
-                        "from_user, to_user, message, created_at"
-                    ).or_(
-                        f"from_user.eq.{username},to_user.eq.{username}"
-                    ).order("created_at", desc=True).execute()
-                    
-                    # Group by conversation partner
-                    conversations = {}
-                    for msg in result.data:
-                        other_user = (
-                            msg["to_user"] if msg["from_user"] == username 
-                            else msg["from_user"]
-                        )
-                        
-                        if other_user not in conversations:
-                            conversations[other_user] = {
-                                "user": other_user,
-                                "last_message": msg["message"],
-                                "last_message_time": msg["created_at"],
-                                "is_online": manager.is_online(other_user)
-                            }
+                    # One summary row per conversation partner (older history: scripts/backfill_conversations.py)
+                    summaries = await conversations_repo.for_user(username)
+
+                    # Partners' presence is pushed as diffs from here on
+                    online = await manager.watch(connection, [row["partner"] for row in summaries])
+                    conversations = [
+                        {
+                            "user": row["partner"],
+                            "last_message": row["last_message"],
+                            "last_message_time": row["last_message_time"],
+                            "unread_count": row.get("unread_count", 0),
+                            "is_online": online[row["partner"]]
+                        }
+                        for row in summaries
+                    ]
                     
-                    await websocket.send_json({
+                    await connection.send({
                         "type": "conversations",
-                        "data": list(conversations.values())
+                        "data": conversations
                     })
                     
                 except Exception as e:
                     print(f"Error fetching conversations: {e}")
-                    await websocket.send_json({
+                    await connection.send({
                         "type": "error",
                         "message": f"Failed to load conversations: {str(e)}"
                     })
@@ -212,11 +613,10 @@ async def websocket_endpoint(websocket: WebSocket, username: str):
                 
                 try:
                     # Update all unread messages from other_user as read
-                    supabase.table("messages").update({
-                        "read": True
-                    }).eq("from_user", other_user).eq("to_user", username).eq("read", False).execute()
+                    await messages_repo.mark_read(other_user, username)
+                    await conversations_repo.mark_read(username, other_user)
                     
-                    await websocket.send_json({
+                    await connection.send({
                         "type": "marked_read",
                         "from_user": other_user
                     })
@@ -232,19 +632,17 @@ async def websocket_endpoint(websocket: WebSocket, username: str):
                 
                 try:
                     # Delete all messages between these users
-                    supabase.table("messages").delete().or_(
-                        f"and(from_user.eq.{username},to_user.eq.{other_user}),"
-                        f"and(from_user.eq.{other_user},to_user.eq.{username})"
-                    ).execute()
+                    await messages_repo.delete_conversation(username, other_user)
+                    await conversations_repo.delete_pair(username, other_user)
                     
-                    await websocket.send_json({
+                    await connection.send({
                         "type": "conversation_deleted",
                         "with_user": other_user
                     })
                     
                 except Exception as e:
                     print(f"Error deleting conversation: {e}")
-                    await websocket.send_json({
+                    await connection.send({
                         "type": "error",
                         "message": f"Failed to delete conversation: {str(e)}"
                     })
@@ -253,18 +651,24 @@ async def websocket_endpoint(websocket: WebSocket, username: str):
             # 8. PING/PONG (Keep-alive)
             # ===============================
             elif message_type == "ping":
-                await websocket.send_json({"type": "pong"})
+                await connection.send({"type": "pong"})
     
     except WebSocketDisconnect:
-        manager.disconnect(username)
+        await manager.disconnect(username, connection)
     except Exception as e:
         print(f"WebSocket error for {username}: {e}")
-        manager.disconnect(username)
+        await manager.disconnect(username, connection)
 
-@router.get("/online-users")
+@router.get("/online-users", dependencies=[Depends(get_current_user)])
 async def get_online_users():
-    """REST endpoint to check who's online"""
+    """REST endpoint to check who's online, across every worker"""
+    online_users = await manager.online_users()
     return {
-        "online_users": list(manager.active_connections.keys()),
-        "count": len(manager.active_connections)
-    }
\ No newline at end of file
+        "online_users": online_users,
+        "count": len(online_users)
+    }
+
+@router.get("/connection-stats", dependencies=[Depends(get_current_user)])
+async def get_connection_stats():
+    """Send latency, queue depth and drops of this worker's sockets, most lagging first"""
+    return manager.stats()
@@ -0,0 +1,24 @@
+import asyncio
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Query
+
+from app.utils.auth import require_admin
+from app.utils.profiler import Sampler, PROFILE_MAX_SECONDS
+
+# Only included when PROFILING_ENABLED is set (see main.py)
+router = APIRouter(prefix="/debug", tags=["Debug"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/profile")
+async def profile_process(
+    seconds: float = Query(10, gt=0, le=PROFILE_MAX_SECONDS),
+    format: Literal["collapsed", "speedscope"] = "collapsed",
+):
+    """Sample every thread of this worker for `seconds` and return the profile"""
+    sampler = Sampler().start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        sampler.stop()
+    return sampler.response(format, f"process ({seconds:g}s)")
@@ -1,55 +1,98 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Dict
 
-from app.db import get_supabase
 from app.schemas.match_schema import MatchRequest
-from app.ml.matcher import build_skill_vector, compute_match_score
+from app.ml.matcher import (
+    build_skill_matrix, score_with, rank_matches, idf_weights, category_matrix, experience_rank
+)
+from app.ml.match_cache import match_cache, target_role
+from app.ml.skill_index import skill_index
 from app.routes.users import get_user_by_username
+from app.repositories import users as users_repo
+from app.repositories import skills as skills_repo
+from app.repositories import user_skills as user_skills_repo
 
 router = APIRouter(prefix="/match", tags=["Matching"])
 
-@router.post("/")
-def find_matches(data: MatchRequest, supabase = Depends(get_supabase)) -> Dict[str, List[Dict]]:
-    user = get_user_by_username(data.username)
-    if not user:
-        raise HTTPException(status_code=400, detail="Invalid user")
-
-    role = user["role"]
-    target_role = "mentor" if role == "mentee" else "mentee"
 
+async def _match_inputs_from_db(user, target_role, scorer):
+    """
+    Index miss: load candidates, skills and every user-skill assignment
+    straight from Supabase and build the same inputs the index would.
+    """
     # Fetch all target users
-    targets = supabase.table("users").select("*").eq("role", target_role).execute().data
+    targets = await users_repo.list_users(role=target_role)
 
     # Fetch all skills once
-    all_skills_data = supabase.table("skills").select("*").execute().data
+    all_skills_data = await skills_repo.list_skills()
     skill_id_to_name = {s["skill_id"]: s["name"] for s in all_skills_data}
-    all_skill_names = [s["name"] for s in all_skills_data]
+    all_skill_ids = [s["skill_id"] for s in all_skills_data]
+
+    # Every user-skill assignment in one bulk query
+    assignments = await user_skills_repo.list_all()
+
+    skills_by_user = {}
+    for row in assignments:
+        skills_by_user.setdefault(row["user_id"], []).append(skill_id_to_name[row["skill_id"]])
+
+    # Row 0 is the requester, the rest are candidates in query order
+    user_ids = [user["user_id"]] + [t["user_id"] for t in targets]
+    matrix = build_skill_matrix(user_ids, all_skill_ids, assignments)
 
-    # User skills
-    user_skill_rows = supabase.table("user_skills").select("skill_id").eq("user_id", user["user_id"]).execute().data
-    user_skill_names = [skill_id_to_name[row["skill_id"]] for row in user_skill_rows]
+    context = {}
+    if scorer == "idf_cosine":
+        doc_freq = {}
+        for row in assignments:
+            doc_freq[row["skill_id"]] = doc_freq.get(row["skill_id"], 0) + 1
+        context["idf"] = idf_weights([doc_freq.get(i, 0) for i in all_skill_ids], len(skills_by_user))
+    if scorer == "blend":
+        context["skill_category"] = category_matrix([s.get("category") for s in all_skills_data])
+        context["candidate_levels"] = [experience_rank(t.get("experience_level")) for t in targets]
+        context["query_level"] = experience_rank(user.get("experience_level"))
+        context["candidates_are_mentors"] = target_role == "mentor"
 
-    user_vec = build_skill_vector(user_skill_names, all_skill_names)
+    if skill_index.ready:
+        skill_ids = [row["skill_id"] for row in assignments if row["user_id"] == user["user_id"]]
+        skill_index.load_user(user, skill_ids)
 
-    matches = []
+    return targets, matrix, lambda target: skills_by_user.get(target["user_id"], []), context
 
-    for target in targets:
-        target_skill_rows = supabase.table("user_skills").select("skill_id").eq("user_id", target["user_id"]).execute().data
-        target_skill_names = [skill_id_to_name[row["skill_id"]] for row in target_skill_rows]
 
-        target_vec = build_skill_vector(target_skill_names, all_skill_names)
-        score = compute_match_score(user_vec, target_vec)
+@router.post("/")
+async def find_matches(data: MatchRequest) -> Dict[str, List[Dict]]:
+    user = skill_index.get_user(data.username) or await get_user_by_username(data.username)
+    if not user:
+        raise HTTPException(status_code=400, detail="Invalid user")
 
-        if score > 0:  # only include relevant matches
-            matches.append({
-                "username": target["username"],
-                "name": target["name"],
-                "role": target["role"],
-                "skills": target_skill_names,
-                "score": score
-            })
+    # Precomputed recommendations (plain cosine only) unless a live computation is forced
+    if not data.live and data.scorer == "cosine":
+        cached = match_cache.get(user["user_id"], data.limit)
+        if cached is not None:
+            return {"matches": cached}
 
-    # Sort matches by descending score
-    matches.sort(key=lambda x: x["score"], reverse=True)
+    # Scoring is CPU-bound; keep it off the event loop
+    matches = await run_in_threadpool(
+        skill_index.matches_for,
+        user["user_id"], target_role(user["role"]), data.limit, data.prune_factor, data.scorer
+    )
+    if matches is None:
+        targets, matrix, skills_of, context = await _match_inputs_from_db(
+            user, target_role(user["role"]), data.scorer
+        )
+        scores = await run_in_threadpool(score_with, data.scorer, matrix[1:], matrix[0], context)
+        matches = await run_in_threadpool(rank_matches, targets, scores, skills_of, data.limit)
 
     return {"matches": matches}
+
+
+@router.get("/index-stats")
+async def index_stats():
+    """Size and hit rate of the in-memory skill index"""
+    return skill_index.stats()
+
+
+@router.get("/cache-stats")
+async def cache_stats():
+    """Hit rate and refresh timings of the precomputed match cache"""
+    return match_cache.stats()
@@ -1,18 +1,75 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.db import get_supabase
+import asyncio
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from typing import Literal, Optional
+from app.models.mentorship import TABLE_NAME, PRIMARY_KEY, COLUMNS
+from app.utils.pagination import parse_fields, list_rows, MAX_PAGE_SIZE
 from app.schemas.mentorship_schema import MentorshipCreate
 from app.routes.users import get_user_by_username
+from app.repositories import mentorships as mentorships_repo
+from app.ml.skill_index import skill_index
+from app.utils.auth import get_current_user
+from app.utils.cache import idempotency_cache, IDEMPOTENCY_PENDING_TTL
 
 router = APIRouter(
     prefix="/mentorships",
     tags=["Mentorships"]
 )
 # ---------------- CREATE ----------------
+async def _get_user(username: str):
+    # the skill index row carries the role; the user cache covers a cold index
+    return skill_index.get_user(username) or await get_user_by_username(username)
+
+async def _reserve(cache_key: str, request: list):
+    """
+    Claim an Idempotency-Key before doing the work: None once reserved,
+    else the response stored by the request that used it first.
+    """
+    while True:
+        if await idempotency_cache.add(cache_key, {"request": request, "pending": True}, IDEMPOTENCY_PENDING_TTL):
+            return None
+        stored = await idempotency_cache.get(cache_key)
+        if stored is None:
+            continue    # the reservation expired in between; try again
+        if stored["request"] != request:
+            raise HTTPException(422, "Idempotency-Key was already used for a different mentorship")
+        if stored.get("pending"):
+            raise HTTPException(409, "A request with this Idempotency-Key is still in progress")
+        return stored["response"]
+
 @router.post("/")
-def create_mentorship(data: MentorshipCreate, supabase=Depends(get_supabase)):
+async def create_mentorship(
+    data: MentorshipCreate,
+    idempotency_key: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    A retry with the same Idempotency-Key gets the first response back,
+    and a concurrent one gets 409 while the first is in progress. Keys
+    are shared across workers only with CACHE_BACKEND=redis.
+    """
+    request = [data.mentor_name, data.mentee_name]
+    cache_key = f"{current_user['username']}:{idempotency_key}" if idempotency_key else None
+    if cache_key:
+        stored = await _reserve(cache_key, request)
+        if stored is not None:
+            return stored
+
+    try:
+        result = await _create_mentorship(data)
+    except BaseException:
+        # a failed request does not hold the key; the client may retry it
+        if cache_key:
+            await idempotency_cache.invalidate(cache_key)
+        raise
+
+    if cache_key:
+        await idempotency_cache.set(cache_key, {"request": request, "response": result})
+    return result
+
+async def _create_mentorship(data: MentorshipCreate):
+    # 1. Look up mentor and mentee together (no round trip when cached)
+    mentor, mentee = await asyncio.gather(_get_user(data.mentor_name), _get_user(data.mentee_name))
 
-    # 1. Verify mentor exists
-    mentor = get_user_by_username(data.mentor_name)
     if not mentor:
         raise HTTPException(400, "Mentor username does not exist")
 
@@ -21,7 +78,6 @@ def create_mentorship(data: MentorshipCreate, supabase=Depends(get_supabase)):
         raise HTTPException(400, "This user is not a mentor")
 
     # 3. Verify mentee exists
-    mentee = get_user_by_username(data.mentee_name)
     if not mentee:
         raise HTTPException(400, "Mentee username does not exist")
 
@@ -33,92 +89,70 @@ def create_mentorship(data: MentorshipCreate, supabase=Depends(get_supabase)):
     if data.mentor_name == data.mentee_name:
         raise HTTPException(400, "User cannot mentor themselves")
 
-    # 6. 🔥 CHECK IF MENTORSHIP ALREADY EXISTS
-    existing = (
-        supabase
-        .table("mentorships")
-        .select("*")
-        .eq("mentor_name", data.mentor_name)
-        .eq("mentee_name", data.mentee_name)
-        .execute()
-        .data
-    )
+    # 6. Insert unless the pair exists, atomically (unique constraint + on conflict do nothing)
+    mentorship = await mentorships_repo.create_if_absent(data.mentor_name, data.mentee_name)
 
-    if existing:
+    if mentorship is None:
         # ✅ Do NOT create again
-        return {
+        result = {
             "message": "Mentorship already exists",
-            "mentorship": existing[0]
+            "mentorship": await mentorships_repo.find_pair(data.mentor_name, data.mentee_name)
+        }
+    else:
+        result = {
+            "message": "Mentorship created successfully",
+            "mentorship": mentorship
         }
 
-    # 7. ✅ CREATE MENTORSHIP ONLY IF NOT EXISTS
-    mentorship = (
-        supabase
-        .table("mentorships")
-        .insert({
-            "mentor_name": data.mentor_name,
-            "mentee_name": data.mentee_name,
-        })
-        .execute()
-        .data[0]
-    )
-
-    return {
-        "message": "Mentorship created successfully",
-        "mentorship": mentorship
-    }
+    return result
 
 
 # ---------------- READ ALL ----------------
 @router.get("/")
-def get_all_mentorships(supabase=Depends(get_supabase)):
-    res = supabase.table("mentorships").select("*").execute()
-    return res.data
+async def get_all_mentorships(
+    response: Response,
+    mentor_name: Optional[str] = None,
+    mentee_name: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+    format: Literal["json", "ndjson"] = "json",
+):
+    columns = parse_fields(fields, COLUMNS, key=PRIMARY_KEY)
+    return await list_rows(
+        response, TABLE_NAME, PRIMARY_KEY, columns,
+        {"mentor_name": mentor_name, "mentee_name": mentee_name}, cursor, limit, format
+    )
 
 
 # ---------------- READ SPECIFIC ----------------
 @router.get("/{mentorship_id}")
-def get_mentorship(mentorship_id: str, supabase=Depends(get_supabase)):
-    res = (
-        supabase.table("mentorships")
-        .select("*")
-        .eq("mentorship_id", mentorship_id)
-        .execute()
-    )
+async def get_mentorship(mentorship_id: str):
+    mentorship = await mentorships_repo.get(mentorship_id)
 
-    if not res.data:
+    if not mentorship:
         raise HTTPException(status_code=404, detail="Mentorship not found")
 
-    return res.data[0]
+    return mentorship
 
 
 # ---------------- UPDATE ----------------
 @router.put("/{mentorship_id}")
-def update_mentorship(mentorship_id: str, updates: dict, supabase=Depends(get_supabase)):
-    res = (
-        supabase.table("mentorships")
-        .update(updates)
-        .eq("mentorship_id", mentorship_id)
-        .execute()
-    )
+async def update_mentorship(mentorship_id: str, updates: dict):
+    rows = await mentorships_repo.update(mentorship_id, updates)
 
-    if not res.data:
+    if not rows:
         raise HTTPException(status_code=404, detail="Mentorship not found")
 
-    return res.data[0]
+    return rows[0]
 
 
 # ---------------- DELETE ----------------
 @router.delete("/{mentorship_id}")
-def delete_mentorship(mentorship_id: str, supabase=Depends(get_supabase)):
-    res = (
-        supabase.table("mentorships")
-        .delete()
-        .eq("mentorship_id", mentorship_id)
-        .execute()
-    )
+async def delete_mentorship(mentorship_id: str):
+    rows = await mentorships_repo.delete(mentorship_id)
 
-    if not res.data:
+    if not rows:
         raise HTTPException(status_code=404, detail="Mentorship not found")
 
     return {"message": "Mentorship deleted"}
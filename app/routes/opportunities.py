@@ -1,37 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.db import get_supabase
+from fastapi import APIRouter, HTTPException, Query, Response
+from typing import Literal, Optional
+from app.models.opportunities import TABLE_NAME, PRIMARY_KEY, COLUMNS
+from app.utils.pagination import parse_fields, list_rows, MAX_PAGE_SIZE
 from app.schemas.opportunity_schema import OpportunityCreate
+from app.repositories import users as users_repo
+from app.repositories import opportunities as opportunities_repo
+from app.ml.opportunity_index import opportunity_index, RECOMMEND_TOP_N
+from app.ml.skill_index import skill_index
+from app.routes.users import get_user_by_username
 
 router = APIRouter()
 
 @router.post("/")
-def create_opportunity(
-    data: OpportunityCreate,
-    supabase=Depends(get_supabase)
-):
+async def create_opportunity(data: OpportunityCreate):
     # 1. (Optional but recommended) verify user exists
-    user = (
-        supabase.table("users")
-        .select("username")
-        .eq("username", data.posted_by)
-        .execute()
-        .data
-    )
+    user = await users_repo.get_by_username(data.posted_by, columns="username")
     if not user:
         raise HTTPException(400, "User does not exist")
 
     # 2. Insert opportunity
-    opp = (
-        supabase.table("opportunities")
-        .insert({
-            "title": data.title,
-            "description": data.description,
-            "posted_by": data.posted_by,
-            "type": data.type
-        })
-        .execute()
-        .data[0]
-    )
+    opp = await opportunities_repo.create({
+        "title": data.title,
+        "description": data.description,
+        "posted_by": data.posted_by,
+        "type": data.type
+    })
+
+    opportunity_index.invalidate()
 
     # 3. Return the created row (must include opp_id)
     return opp
@@ -40,29 +35,70 @@ def create_opportunity(
 
 # READ ALL
 @router.get("/")
-def get_all_opportunities(supabase = Depends(get_supabase)):
-    return supabase.table("opportunities").select("*").execute().data
+async def get_all_opportunities(
+    response: Response,
+    type: Optional[str] = None,
+    posted_by: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+    format: Literal["json", "ndjson"] = "json",
+):
+    columns = parse_fields(fields, COLUMNS, key=PRIMARY_KEY)
+    return await list_rows(
+        response, TABLE_NAME, PRIMARY_KEY, columns,
+        {"type": type, "posted_by": posted_by}, cursor, limit, format
+    )
+
+# RECOMMENDED FOR A USER
+@router.get("/recommended/{username}")
+async def get_recommended_opportunities(username: str, limit: int = Query(10, ge=1, le=RECOMMEND_TOP_N)):
+    """Opportunities ranked by cosine between their skills and the user's"""
+    user = skill_index.get_user(username) or await get_user_by_username(username)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return {
+        "username": username,
+        "opportunities": await opportunity_index.for_user(user, limit)
+    }
+
+# USERS RANKED FOR AN OPPORTUNITY
+@router.get("/{opp_id}/candidates")
+async def get_opportunity_candidates(
+    opp_id: str,
+    role: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=RECOMMEND_TOP_N),
+):
+    """Users (optionally of one role) ranked by how well their skills fit the opportunity"""
+    if await opportunity_index.get_opportunity(opp_id) is None:
+        raise HTTPException(status_code=404, detail="Opportunity not found")
+    return {
+        "opp_id": opp_id,
+        "users": await opportunity_index.users_for(opp_id, role, limit)
+    }
 
 # READ ONE
 @router.get("/{opp_id}")
-def get_opportunity(opp_id: str, supabase = Depends(get_supabase)):
-    res = supabase.table("opportunities").select("*").eq("opp_id", opp_id).execute()
-    if not res.data:
+async def get_opportunity(opp_id: str):
+    opp = await opportunities_repo.get(opp_id)
+    if not opp:
         raise HTTPException(status_code=404, detail="Opportunity not found")
-    return res.data[0]
+    return opp
 
 # UPDATE
 @router.put("/{opp_id}")
-def update_opportunity(opp_id: str, updates: dict, supabase = Depends(get_supabase)):
-    res = supabase.table("opportunities").update(updates).eq("opp_id", opp_id).execute()
-    if not res.data:
+async def update_opportunity(opp_id: str, updates: dict):
+    rows = await opportunities_repo.update(opp_id, updates)
+    if not rows:
         raise HTTPException(status_code=404, detail="Opportunity not found")
-    return res.data[0]
+    opportunity_index.invalidate()
+    return rows[0]
 
 # DELETE
 @router.delete("/{opp_id}")
-def delete_opportunity(opp_id: str, supabase = Depends(get_supabase)):
-    res = supabase.table("opportunities").delete().eq("opp_id", opp_id).execute()
-    if not res.data:
+async def delete_opportunity(opp_id: str):
+    rows = await opportunities_repo.delete(opp_id)
+    if not rows:
         raise HTTPException(status_code=404, detail="Opportunity not found")
+    opportunity_index.invalidate()
     return {"message": "Opportunity deleted"}
@@ -1,41 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.db import get_supabase
+from fastapi import APIRouter, HTTPException
 from app.schemas.opportunity_skills_schema import OpportunitySkillAssign
-from app.routes.skills import get_skill_by_name
+from app.routes.skills import get_skills_by_names
+from app.repositories import opportunities as opportunities_repo
+from app.ml.opportunity_index import opportunity_index
 
 router = APIRouter(prefix="/opportunity-skills", tags=["Opportunity Skills"])
 
 @router.post("/")
-def assign_skills(data: OpportunitySkillAssign, supabase=Depends(get_supabase)):
+async def assign_skills(data: OpportunitySkillAssign):
 
     opportunity_id = data.opportunity_id
     skill_names = data.skill_names
 
-    inserted_rows = []
+    # 1. Fetch every skill row in one query
+    skills = await get_skills_by_names(skill_names)
 
+    skill_ids = []
     for skill_name in skill_names:
-        # 1. Fetch skill row
-        skill = get_skill_by_name(skill_name)
+        skill = skills.get(skill_name)
         if not skill:
             raise HTTPException(
                 400,
                 detail=f"Skill '{skill_name}' does not exist in skills table"
             )
-
-        skill_id = skill["skill_id"]
-
-        # 2. Insert into the join table
-        res = (
-            supabase
-            .table("opportunity_skills")
-            .insert({
-                "opp_id": opportunity_id,
-                "skill_id": skill_id
-            })
-            .execute()
-        )
-
-        inserted_rows.append(res.data[0])
+        if skill["skill_id"] not in skill_ids:
+            skill_ids.append(skill["skill_id"])
+
+    # Skip links that already exist
+    existing = await opportunities_repo.existing_skill_ids(opportunity_id, skill_ids)
+
+    # 2. Insert into the join table in one upsert
+    inserted_rows = await opportunities_repo.add_skills(
+        opportunity_id, [skill_id for skill_id in skill_ids if skill_id not in existing]
+    )
+    if inserted_rows:
+        opportunity_index.invalidate()
 
     return {
         "message": "Skills assigned to opportunity",
@@ -1,72 +1,106 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.db import get_supabase
+from fastapi import APIRouter, HTTPException, Query, Response
+from typing import Literal, Optional
+from app.models.skills import TABLE_NAME, PRIMARY_KEY, COLUMNS
+from app.utils.pagination import parse_fields, list_rows, MAX_PAGE_SIZE
 from app.schemas.skill_schema import SkillCreate
+from app.ml.skill_index import skill_index
+from app.ml.opportunity_index import opportunity_index
+from app.repositories import skills as skills_repo
+from app.utils.cache import skill_cache
 
 router = APIRouter()
 
 # CREATE
 @router.post("/")
-def add_skill(skill: SkillCreate, supabase = Depends(get_supabase)):
-    res = supabase.table("skills").insert({
+async def add_skill(skill: SkillCreate):
+    rows = await skills_repo.create({
         "name": skill.name,
         "category": skill.category,
         "skill_description": skill.skill_description
-    }).execute()
-    return res.data
+    })
+    for row in rows:
+        skill_index.put_skill(row)
+    await skill_cache.invalidate(skill.name)
+    return rows
 
 # GET ALL
 @router.get("/")
-def get_all_skills(supabase = Depends(get_supabase)):
-    return supabase.table("skills").select("*").execute().data
+async def get_all_skills(
+    response: Response,
+    category: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+    format: Literal["json", "ndjson"] = "json",
+):
+    columns = parse_fields(fields, COLUMNS, key=PRIMARY_KEY)
+    return await list_rows(
+        response, TABLE_NAME, PRIMARY_KEY, columns, {"category": category}, cursor, limit, format
+    )
 
 # GET ONE
 @router.get("/{name}")
-def get_skill(name: str, supabase = Depends(get_supabase)):
-    res = supabase.table("skills").select("*").eq("name", name).execute()
-    if not res.data:
+async def get_skill(name: str):
+    skill = await get_skill_by_name(name)
+    if not skill:
         raise HTTPException(status_code=404, detail="Skill not found")
-    return res.data[0]
+    return skill
 
 # UPDATE
 @router.put("/{name}")
-def update_skill(name: str, updates: dict, supabase = Depends(get_supabase)):
-    res = supabase.table("skills").update(updates).eq("name", name).execute()
-    if not res.data:
+async def update_skill(name: str, updates: dict):
+    rows = await skills_repo.update(name, updates)
+    if not rows:
         raise HTTPException(status_code=404, detail="Skill not found")
-    return res.data[0]
+    skill_index.put_skill(rows[0])
+    await skill_cache.invalidate(name, rows[0].get("name"))
+    return rows[0]
 
 # DELETE
 @router.delete("/{name}")
-def delete_skill(name: str, supabase = Depends(get_supabase)):
-    res = supabase.table("skills").delete().eq("name", name).execute()
-    if not res.data:
+async def delete_skill(name: str):
+    rows = await skills_repo.delete(name)
+    if not rows:
         raise HTTPException(status_code=404, detail="Skill not found")
+    for row in rows:
+        skill_index.remove_skill(row)
+    await skill_cache.invalidate(name)
+    # opportunity_skills links to it are gone too
+    opportunity_index.invalidate()
     return {"message": "Skill deleted"}
 
-supabase = get_supabase()
+async def get_skill_by_name(name: str):
+    """Fetch a single skill by name, read through the skill cache."""
+    return await skill_cache.get_or_load(name, skills_repo.get_by_name)
 
-def get_skill_by_name(name: str):
-    res = supabase.table("skills").select("*").eq("name", name).execute()
-    return res.data[0] if res.data else None
+
+async def get_skills_by_names(names):
+    """
+    Fetch several skills with one query.
+    Returns a dict name -> skill row; unknown names are absent.
+    """
+    return {skill["name"]: skill for skill in await skills_repo.get_by_names(set(names))}
 
 
-def create_skill(name: str, category="auto", skill_description="auto-added"):
+async def create_skill(name: str, category="auto", skill_description="auto-added"):
     """
     Insert a new skill if it doesn't exist.
     """
-    res = supabase.table("skills").insert({
+    rows = await skills_repo.create({
         "name": name,
         "category": category,
         "skill_description": skill_description
-    }).execute()
-    return res.data[0]
+    })
+    skill_index.put_skill(rows[0])
+    await skill_cache.invalidate(name)
+    return rows[0]
 
 
-def get_or_create_skill(name: str):
+async def get_or_create_skill(name: str):
     """
     Check if a skill exists; if not, create it.
     """
-    skill = get_skill_by_name(name)
+    skill = await get_skill_by_name(name)
     if skill:
         return skill
-    return create_skill(name)
+    return await create_skill(name)
@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.db import get_supabase
+from fastapi import APIRouter, HTTPException
+from typing import Optional
 from app.schemas.user_skill_schema import UserSkillAssign
-from app.routes.skills import get_skill_by_name
+from app.routes.skills import get_skill_by_name, get_skills_by_names
 from app.routes.users import get_user_by_username
+from app.ml.skill_index import skill_index
+from app.models.skills import COLUMNS as SKILL_COLUMNS
+from app.repositories import user_skills as user_skills_repo
 
 router = APIRouter(
     prefix="/user-skills",
@@ -11,53 +14,37 @@ router = APIRouter(
 
 
 @router.post("/")
-def assign_user_skills(data: UserSkillAssign, supabase = Depends(get_supabase)):
+async def assign_user_skills(data: UserSkillAssign):
     """
     Assign skills to a user by username
     """
     # 1. Fetch user by username
-    user = get_user_by_username(data.username)
+    user = await get_user_by_username(data.username)
     if not user:
         raise HTTPException(400, f"User '{data.username}' does not exist")
 
     user_id = user["user_id"]
 
-    inserted_rows = []
+    # 2. Resolve every skill name in one query
+    skills = await get_skills_by_names(data.skill_names)
 
-    # 2. Loop through skill names
+    skill_ids = []
     for skill_name in data.skill_names:
-        # fetch skill row
-        skill = get_skill_by_name(skill_name)
+        skill = skills.get(skill_name)
         if not skill:
             raise HTTPException(400, f"Skill '{skill_name}' does not exist")
+        if skill["skill_id"] not in skill_ids:
+            skill_ids.append(skill["skill_id"])
 
-        skill_id = skill["skill_id"]
-
-        # Check if mapping already exists
-        existing = (
-            supabase
-            .table("user_skills")
-            .select("*")
-            .eq("user_id", user_id)
-            .eq("skill_id", skill_id)
-            .execute()
-        )
-        
-        if existing.data:
-            continue  # Skip if already exists
-
-        # 3. Insert mapping into user_skills
-        res = (
-            supabase
-            .table("user_skills")
-            .insert({
-                "user_id": user_id,
-                "skill_id": skill_id
-            })
-            .execute()
-        )
-
-        inserted_rows.append(res.data[0])
+    # Skip mappings that already exist
+    existing = await user_skills_repo.existing_skill_ids(user_id, skill_ids)
+
+    # 3. Insert every new mapping into user_skills in one upsert
+    inserted_rows = await user_skills_repo.create_many(
+        user_id, [skill_id for skill_id in skill_ids if skill_id not in existing]
+    )
+
+    skill_index.add_user_skills(user_id, [row["skill_id"] for row in inserted_rows])
 
     return {
         "message": f"Skills assigned to user '{data.username}'",
@@ -65,79 +52,70 @@ def assign_user_skills(data: UserSkillAssign, supabase = Depends(get_supabase)):
     }
 
 
+def _parse_fields(fields: Optional[str]):
+    """Validate a ?fields=a,b projection against the skills columns."""
+    if not fields:
+        return None
+    columns = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [c for c in columns if c not in SKILL_COLUMNS]
+    if unknown:
+        raise HTTPException(400, f"Unknown skill field(s): {', '.join(unknown)}")
+    return columns
+
+
 @router.get("/{username}")
-def get_user_skills(username: str, supabase = Depends(get_supabase)):
+async def get_user_skills(username: str, fields: Optional[str] = None):
     """
-    Get all skills for a specific user by username
+    Get all skills for a specific user by username.
+    ?fields=name,category returns only those columns.
     """
-    # 1. Get user
-    user = get_user_by_username(username)
-    if not user:
-        raise HTTPException(404, f"User '{username}' does not exist")
-    
-    user_id = user["user_id"]
-    
-    # 2. Get user_skills mappings
-    user_skill_rows = (
-        supabase
-        .table("user_skills")
-        .select("skill_id")
-        .eq("user_id", user_id)
-        .execute()
-        .data
-    )
-    
-    if not user_skill_rows:
-        return []
-    
-    # 3. Get skill details for each skill_id
-    skills = []
-    for row in user_skill_rows:
-        skill_id = row["skill_id"]
-        skill_data = (
-            supabase
-            .table("skills")
-            .select("*")
-            .eq("skill_id", skill_id)
-            .execute()
-            .data
-        )
-        if skill_data:
-            skills.append(skill_data[0])
-    
+    columns = _parse_fields(fields)
+
+    # Served from the skill index; Supabase is only hit on a miss
+    skills = skill_index.user_skills(username)
+
+    if skills is None:
+        # 1. Get user
+        user = await get_user_by_username(username)
+        if not user:
+            raise HTTPException(404, f"User '{username}' does not exist")
+
+        # 2. Skill rows joined through user_skills in one query
+        skills = await user_skills_repo.skills_for_user(user["user_id"])
+
+        if skill_index.ready:
+            for skill in skills:
+                skill_index.put_skill(skill)
+            skill_index.load_user(user, [skill["skill_id"] for skill in skills])
+
+    if columns:
+        return [{c: skill.get(c) for c in columns} for skill in skills]
     return skills
 
 
 @router.delete("/{username}/{skill_name}")
-def remove_user_skill(username: str, skill_name: str, supabase = Depends(get_supabase)):
+async def remove_user_skill(username: str, skill_name: str):
     """
     Remove a specific skill from a user
     """
     # 1. Get user
-    user = get_user_by_username(username)
+    user = await get_user_by_username(username)
     if not user:
         raise HTTPException(404, f"User '{username}' does not exist")
     
     user_id = user["user_id"]
     
     # 2. Get skill
-    skill = get_skill_by_name(skill_name)
+    skill = await get_skill_by_name(skill_name)
     if not skill:
         raise HTTPException(404, f"Skill '{skill_name}' does not exist")
     
     skill_id = skill["skill_id"]
     
     # 3. Delete mapping
-    res = (
-        supabase
-        .table("user_skills")
-        .delete()
-        .eq("user_id", user_id)
-        .eq("skill_id", skill_id)
-        .execute()
-    )
-    
-    if not res.data:
+    if not await user_skills_repo.delete(user_id, skill_id):
         raise HTTPException(404, "User skill mapping not found")
+
+    skill_index.remove_user_skill(user_id, skill_id)
     
-    return {"message": f"Skill '{skill_name}' removed from user '{username}'"}
\ No newline at end of file
+    return {"message": f"Skill '{skill_name}' removed from user '{username}'"}
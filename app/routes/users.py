@@ -1,22 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.db import get_supabase
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from typing import Literal, Optional
+from app.models.users import TABLE_NAME, PRIMARY_KEY, PUBLIC_COLUMNS
+from app.utils.pagination import parse_fields, list_rows, MAX_PAGE_SIZE
 from app.schemas.user_schema import UserCreate,UserLogin
-from app.utils.hashing import hash_password, verify_password
-from app.utils.auth import create_access_token
+from app.utils.hashing import hash_password_async, verify_password_async
+from app.utils.auth import create_access_token, get_current_user
+from app.ml.skill_index import skill_index
+from app.repositories import users as users_repo
+from app.utils.cache import user_cache
 
 
 router = APIRouter()
 
 # ---------------- CREATE ----------------
 @router.post("/register")
-def register(user: UserCreate, supabase = Depends(get_supabase)):
-    exists = supabase.table("users").select("*").eq("username", user.username).execute()
-    if exists.data:
+async def register(user: UserCreate):
+    if await users_repo.get_by_username(user.username):
         raise HTTPException(status_code=400, detail="Username already taken")
 
-    hashed = hash_password(user.password)
+    # bcrypt is CPU-bound; it runs in the hashing worker pool
+    hashed = await hash_password_async(user.password)
 
-    res = supabase.table("users").insert({
+    rows = await users_repo.create({
         "username": user.username,
         "name": user.name,
         "password_hash": hashed,
@@ -24,87 +29,93 @@ def register(user: UserCreate, supabase = Depends(get_supabase)):
         "phone_number": user.phone_number,
         "experience_level": user.experience_level,
         "profile_summary": user.profile_summary
-    }).execute()
+    })
 
-    return res.data
+    for row in rows:
+        skill_index.put_user(row)
+    # drop the negative entry cached for the (then unknown) username
+    await user_cache.invalidate(user.username)
+
+    return rows
 
 
 # ---------------- READ ----------------
-@router.get("/")
-def get_all_users(supabase = Depends(get_supabase)):
-    res = supabase.table("users").select("*").execute()
-    return res.data
-
-@router.get("/{username}")
-def get_user(username: str, supabase = Depends(get_supabase)):
-    res = (
-        supabase.table("users")
-        .select("*")
-        .eq("username", username)
-        .execute()
+@router.get("/", dependencies=[Depends(get_current_user)])
+async def get_all_users(
+    response: Response,
+    role: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+    format: Literal["json", "ndjson"] = "json",
+):
+    """
+    List users (never password_hash), keyset-paginated on user_id.
+    Filter by role; see app/utils/pagination.py for paging and NDJSON.
+    """
+    columns = parse_fields(fields, PUBLIC_COLUMNS, ", ".join(PUBLIC_COLUMNS), PRIMARY_KEY)
+    return await list_rows(
+        response, TABLE_NAME, PRIMARY_KEY, columns, {"role": role}, cursor, limit, format
     )
 
-    if not res.data:
+@router.get("/{username}", dependencies=[Depends(get_current_user)])
+async def get_user(username: str):
+    user = await get_user_by_username(username)
+
+    if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    return res.data[0]
+    return user
 
 
 
 # ---------------- UPDATE ----------------
-@router.put("/{username}")
-def update_user(username: str, updates: dict, supabase = Depends(get_supabase)):
-    res = supabase.table("users").update(updates).eq("username", username).execute()
-    if not res.data:
+@router.put("/{username}", dependencies=[Depends(get_current_user)])
+async def update_user(username: str, updates: dict):
+    rows = await users_repo.update(username, updates)
+    if not rows:
         raise HTTPException(status_code=404, detail="User not found")
-    return res.data[0]
+    skill_index.put_user(rows[0])
+    await user_cache.invalidate(username, rows[0].get("username"))
+    return rows[0]
 
 
 # ---------------- DELETE ----------------
-@router.delete("/{username}")
-def delete_user(username: str, supabase = Depends(get_supabase)):
-    res = supabase.table("users").delete().eq("username", username).execute()
-    if res.data == []:
+@router.delete("/{username}", dependencies=[Depends(get_current_user)])
+async def delete_user(username: str):
+    rows = await users_repo.delete(username)
+    if rows == []:
         raise HTTPException(status_code=404, detail="User not found")
+    skill_index.remove_user(username)
+    await user_cache.invalidate(username)
     return {"message": "User deleted"}
 
-supabase = get_supabase()
-def get_user_by_username(username: str):
+async def get_user_by_username(username: str):
     """
-    Fetch a single user by username.
+    Fetch a single user by username, read through the user cache.
     Returns a dict (the user row) or None if not found.
     """
-    res = (
-        supabase
-        .table("users")
-        .select("*")
-        .eq("username", username)
-        .execute()
-    )
-
-    return res.data[0] if res.data else None
+    return await user_cache.get_or_load(username, users_repo.get_by_username)
 
 #login code 
 @router.post("/login")
-def login_user(credentials: UserLogin, supabase = Depends(get_supabase)):
+async def login_user(credentials: UserLogin):
     
-    res = (
-        supabase
-        .table("users")
-        .select("*")
-        .eq("username", credentials.username)
-        .execute()
-    )
+    user = await users_repo.get_by_username(credentials.username)
 
-    if not res.data:
+    if not user:
         raise HTTPException(status_code=400, detail="Invalid username or password")
 
-    user = res.data[0]
-
     # verify password
-    if not verify_password(credentials.password, user["password_hash"]):
+    valid, new_hash = await verify_password_async(credentials.password, user["password_hash"])
+    if not valid:
         raise HTTPException(status_code=400, detail="Invalid username or password")
 
+    # stored with an outdated bcrypt cost: upgrade it transparently
+    if new_hash:
+        await users_repo.update(user["username"], {"password_hash": new_hash})
+        await user_cache.invalidate(user["username"])
+
     # generate JWT
     token = create_access_token({"username": user["username"], "role": user["role"]})
 
@@ -1,4 +1,10 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import Literal, Optional
 
 class MatchRequest(BaseModel):
     username: str
+    limit: Optional[int] = Field(None, ge=1)   # top-k; None returns every match
+    # candidate retrieval recall/latency knob: 1.0 is exact, lower prunes harder
+    prune_factor: float = Field(1.0, gt=0, le=1)
+    live: bool = False            # skip the precomputed match cache
+    scorer: Literal["cosine", "idf_cosine", "jaccard", "blend"] = "cosine"
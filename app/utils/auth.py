@@ -1,11 +1,135 @@
-from jose import jwt
+from jose import jwt, JWTError
+import hashlib
 import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
 load_dotenv()
 
 JWT_SECRET = os.getenv("JWT_SECRET")
 JWT_ALGO = os.getenv("JWT_ALGORITHM")
+JWT_KEY_ID = os.getenv("JWT_KEY_ID", "current")
+JWT_EXPIRE_MINUTES = int(os.getenv("JWT_EXPIRE_MINUTES", "1440"))
+# retired signing keys still accepted while their tokens expire: "kid1:secret1,kid2:secret2"
+JWT_PREVIOUS_KEYS = dict(
+    item.split(":", 1) for item in os.getenv("JWT_PREVIOUS_KEYS", "").split(",") if ":" in item
+)
+# tokens issued before key ids (no kid header, no exp or iat) are accepted,
+# with the current key, only until this ISO datetime, e.g.
+# "2026-11-01T00:00:00+00:00"; unset rejects them
+JWT_KIDLESS_UNTIL = (
+    datetime.fromisoformat(os.environ["JWT_KIDLESS_UNTIL"]).timestamp()
+    if os.getenv("JWT_KIDLESS_UNTIL") else None
+)
+
+# usernames allowed on admin-only routes (profiling, bulk import/export);
+# PROFILE_ADMINS is the older name of the same setting
+ADMINS = {
+    u.strip() for u in os.getenv("ADMINS", os.getenv("PROFILE_ADMINS", "")).split(",") if u.strip()
+}
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "300"))
 
 def create_access_token(data: dict):
-    return jwt.encode(data, JWT_SECRET, algorithm=JWT_ALGO)
+    now = datetime.now(timezone.utc)
+    claims = {**data, "iat": now, "exp": now + timedelta(minutes=JWT_EXPIRE_MINUTES)}
+    return jwt.encode(claims, JWT_SECRET, algorithm=JWT_ALGO, headers={"kid": JWT_KEY_ID})
+
+def _signing_key(kid: str):
+    if kid == JWT_KEY_ID:
+        return JWT_SECRET
+    return JWT_PREVIOUS_KEYS.get(kid)
+
+def _decode_legacy(token: str) -> dict:
+    """
+    A token from before key ids, during the JWT_KIDLESS_UNTIL window
+    only. It may carry no exp, so it expires with the window.
+    """
+    if JWT_KIDLESS_UNTIL is None or time.time() >= JWT_KIDLESS_UNTIL:
+        raise JWTError("token without key id")
+    claims = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGO])
+    claims["exp"] = min(claims.get("exp", JWT_KIDLESS_UNTIL), JWT_KIDLESS_UNTIL)
+    return claims
+
+def decode_access_token(token: str) -> dict:
+    """
+    Verify a token from the token alone (signature, exp) and return its
+    claims. Raises 401 when it is invalid, expired, lacks exp or iat, or
+    is signed by an unknown key; tokens without a key id are judged by
+    _decode_legacy instead.
+    """
+    try:
+        kid = jwt.get_unverified_header(token).get("kid")
+        if kid is None:
+            return _decode_legacy(token)
+        key = _signing_key(kid)
+        if key is None:
+            raise JWTError("unknown key id")
+        return jwt.decode(
+            token, key, algorithms=[JWT_ALGO],
+            options={"require_exp": True, "require_iat": True}
+        )
+    except JWTError:
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+# ---------------- CLAIMS CACHE ----------------
+# sha256(token) -> (claims, cached_until); LRU ordered. verify_token is
+# called from the event loop and from threadpool dependencies alike.
+_claims_cache = OrderedDict()
+_claims_lock = threading.Lock()
+
+def verify_token(token: str) -> dict:
+    """decode_access_token behind a small TTL/LRU cache keyed by token hash."""
+    digest = hashlib.sha256(token.encode()).digest()
+    now = time.time()
+
+    with _claims_lock:
+        cached = _claims_cache.get(digest)
+        if cached and cached[1] > now:
+            _claims_cache.move_to_end(digest)
+            return cached[0]
+
+    claims = decode_access_token(token)
+    # never cache a token past its own expiry
+    until = min(now + TOKEN_CACHE_TTL, claims["exp"])
+    with _claims_lock:
+        _claims_cache[digest] = (claims, until)
+        _claims_cache.move_to_end(digest)
+        while len(_claims_cache) > TOKEN_CACHE_SIZE:
+            _claims_cache.popitem(last=False)
+    return claims
+
+_bearer = HTTPBearer(auto_error=False)
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(_bearer)) -> dict:
+    """
+    FastAPI dependency: the decoded claims of the Bearer token
+    ({"username", "role", "iat", "exp"}). No database lookup; async so
+    it runs on the event loop instead of a threadpool hop per request.
+    """
+    if credentials is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return verify_token(credentials.credentials)
+
+def is_admin(claims: dict) -> bool:
+    return claims.get("username") in ADMINS
+
+async def require_admin(claims: dict = Depends(get_current_user)) -> dict:
+    """FastAPI dependency for admin-only routers; 403 for everyone else."""
+    if not is_admin(claims):
+        raise HTTPException(status_code=403, detail="Restricted to admins")
+    return claims
@@ -0,0 +1,278 @@
+import asyncio
+import json
+import os
+import socket
+import time
+from uuid import uuid4
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # optional: only needed for CHAT_BROKER=redis
+    redis = None
+
+CHAT_BROKER = os.getenv("CHAT_BROKER", "memory")              # memory | redis
+CHAT_REDIS_URL = os.getenv("CHAT_REDIS_URL", "redis://localhost:6379/0")
+PRESENCE_TTL = float(os.getenv("PRESENCE_TTL", "30"))
+PRESENCE_HEARTBEAT = float(os.getenv("PRESENCE_HEARTBEAT", "10"))
+HEARTBEAT_CHUNK = 500      # users refreshed per heartbeat script call
+
+PRESENCE_KEY = "chat:presence"
+# this process in the presence sets; users count as online while any worker holds them
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def user_channel(username: str) -> str:
+    """Channel a worker subscribes to while it holds a user's socket."""
+    return f"chat:user:{username}"
+
+
+def presence_channel(username: str) -> str:
+    """Channel carrying a user's online/offline transitions."""
+    return f"chat:presence:{username}"
+
+
+def presence_workers_key(username: str) -> str:
+    """Sorted set of the workers holding a user's sockets, scored by expiry."""
+    return f"chat:presence-workers:{username}"
+
+
+class MemoryBroker:
+    """
+    Single-process broker: publish calls the local subscriber directly
+    and presence is a dict of username -> {worker: expiry}, the same
+    shape as the Redis sets. Enough for one worker and as a stand-in
+    for the Redis broker.
+    """
+
+    def __init__(self):
+        self._handlers = {}     # channel -> async handler(message)
+        self._presence = {}     # username -> {worker_id: expires_at}
+
+    async def start(self):
+        pass
+
+    async def subscribe(self, channel: str, handler):
+        self._handlers[channel] = handler
+
+    async def unsubscribe(self, channel: str):
+        self._handlers.pop(channel, None)
+
+    async def publish(self, channel: str, message: dict):
+        handler = self._handlers.get(channel)
+        if handler is not None:
+            await handler(message)
+
+    async def heartbeat(self, usernames):
+        """
+        Refresh this worker's hold on usernames and sweep expired users.
+        Returns (came_online, went_offline): the users that were not
+        online before this call, and the users whose presence expired.
+        """
+        now = time.time()
+        expires_at = now + PRESENCE_TTL
+        came_online = []
+        for username in usernames:
+            if self._expires_at(username) <= now:
+                came_online.append(username)
+            self._presence.setdefault(username, {})[WORKER_ID] = expires_at
+        went_offline = [u for u in self._presence if self._expires_at(u) <= now]
+        for username in went_offline:
+            del self._presence[username]
+        return came_online, went_offline
+
+    async def leave(self, username: str) -> bool:
+        """Drop this worker's hold on a user; True when no worker holds them any more."""
+        now = time.time()
+        workers = self._presence.get(username, {})
+        workers.pop(WORKER_ID, None)
+        for worker in [w for w, expires_at in workers.items() if expires_at <= now]:
+            del workers[worker]
+        if workers:
+            return False
+        self._presence.pop(username, None)
+        return True
+
+    def _expires_at(self, username: str) -> float:
+        return max(self._presence.get(username, {}).values(), default=0)
+
+    async def online(self, usernames):
+        """The subset of usernames whose presence has not expired."""
+        now = time.time()
+        return {u for u in usernames if self._expires_at(u) > now}
+
+    async def all_online(self):
+        now = time.time()
+        return [u for u in self._presence if self._expires_at(u) > now]
+
+    async def close(self):
+        self._handlers.clear()
+        self._presence.clear()
+
+
+class RedisBroker:
+    """
+    Fan-out across uvicorn workers and pods through any Redis-protocol
+    server. Each worker subscribes to the channels of the users whose
+    sockets it holds, so a publish reaches exactly the worker (if any)
+    that can deliver it.
+
+    Presence is kept per worker: chat:presence-workers:<user> scores each
+    worker holding the user by expiry, and chat:presence scores the user
+    by the latest of those. Workers refresh their users every
+    PRESENCE_HEARTBEAT seconds. Both heartbeat() and leave() are atomic
+    scripts that report the transitions they cause: a user comes online
+    when a heartbeat finds no live score, goes offline when the last
+    worker holding them lets go, and a crashed worker's users are swept
+    (and reported offline) by the first heartbeat after PRESENCE_TTL.
+    """
+
+    def __init__(self, url: str = CHAT_REDIS_URL):
+        if redis is None:
+            raise RuntimeError("CHAT_BROKER=redis needs the 'redis' package")
+        self._client = redis.from_url(url)
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        self._handlers = {}
+        self._task = None
+        self._heartbeat = self._client.register_script(_HEARTBEAT_SCRIPT)
+        self._leave = self._client.register_script(_LEAVE_SCRIPT)
+
+    async def start(self):
+        self._task = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        while True:
+            if not self._pubsub.subscribed:
+                await asyncio.sleep(0.1)
+                continue
+            try:
+                raw = await self._pubsub.get_message(timeout=1.0)
+                if raw is None:
+                    continue
+                channel = raw["channel"]
+                if isinstance(channel, bytes):
+                    channel = channel.decode()
+                handler = self._handlers.get(channel)
+                if handler is not None:
+                    await handler(json.loads(raw["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Chat broker listener error: {e}")
+                await asyncio.sleep(1)
+
+    async def subscribe(self, channel: str, handler):
+        self._handlers[channel] = handler
+        await self._pubsub.subscribe(channel)
+
+    async def unsubscribe(self, channel: str):
+        self._handlers.pop(channel, None)
+        await self._pubsub.unsubscribe(channel)
+
+    async def publish(self, channel: str, message: dict):
+        await self._client.publish(channel, json.dumps(message, default=str))
+
+    async def heartbeat(self, usernames):
+        """
+        Refresh this worker's hold on usernames and sweep expired users.
+        Returns (came_online, went_offline); each expired user is claimed
+        by exactly one worker's sweep, so its offline is published once.
+        """
+        usernames = list(usernames)
+        now = time.time()
+        came_online, went_offline = [], []
+        # one script per chunk keeps Redis responsive with many users
+        for i in range(0, max(len(usernames), 1), HEARTBEAT_CHUNK):
+            chunk = usernames[i:i + HEARTBEAT_CHUNK]
+            came, gone = await self._heartbeat(
+                keys=[PRESENCE_KEY] + [presence_workers_key(u) for u in chunk],
+                args=[WORKER_ID, now, now + PRESENCE_TTL, int(2 * PRESENCE_TTL * 1000)] + chunk
+            )
+            came_online += [_decode(u) for u in came]
+            went_offline += [_decode(u) for u in gone]
+        return came_online, went_offline
+
+    async def leave(self, username: str) -> bool:
+        """Drop this worker's hold on a user; True when no worker holds them any more."""
+        gone = await self._leave(
+            keys=[presence_workers_key(username), PRESENCE_KEY],
+            args=[WORKER_ID, username, time.time()]
+        )
+        return bool(gone)
+
+    async def online(self, usernames):
+        usernames = list(usernames)
+        if not usernames:
+            return set()
+        now = time.time()
+        scores = await self._client.zmscore(PRESENCE_KEY, usernames)
+        return {u for u, score in zip(usernames, scores) if score is not None and score > now}
+
+    async def all_online(self):
+        members = await self._client.zrangebyscore(PRESENCE_KEY, time.time(), "+inf")
+        return [_decode(m) for m in members]
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._pubsub.aclose()
+        await self._client.aclose()
+
+
+# Refresh this worker in each user's set (KEYS[2..]) and raise the users'
+# scores in chat:presence; users without a live score came online. Then
+# claim every user whose score has expired: they went offline.
+_HEARTBEAT_SCRIPT = """
+local now = tonumber(ARGV[2])
+local expires_at = tonumber(ARGV[3])
+local came = {}
+for i = 2, #KEYS do
+    local user = ARGV[i + 3]
+    redis.call('ZADD', KEYS[i], ARGV[3], ARGV[1])
+    redis.call('PEXPIRE', KEYS[i], ARGV[4])
+    local score = redis.call('ZSCORE', KEYS[1], user)
+    if not score or tonumber(score) <= now then
+        came[#came + 1] = user
+    end
+    if not score or tonumber(score) < expires_at then
+        redis.call('ZADD', KEYS[1], ARGV[3], user)
+    end
+end
+local gone = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[2])
+if #gone > 0 then
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[2])
+end
+return {came, gone}
+"""
+
+
+# Remove this worker from a user's set, drop expired workers, then either
+# lower the user's score to the latest remaining expiry or remove the user.
+_LEAVE_SCRIPT = """
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[3])
+local last = redis.call('ZRANGE', KEYS[1], -1, -1, 'WITHSCORES')
+if #last == 0 then
+    redis.call('ZREM', KEYS[2], ARGV[2])
+    return 1
+end
+redis.call('ZADD', KEYS[2], last[2], ARGV[2])
+return 0
+"""
+
+
+def make_broker():
+    if CHAT_BROKER == "redis":
+        return RedisBroker()
+    return MemoryBroker()
+
+
+broker = make_broker()
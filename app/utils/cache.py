@@ -0,0 +1,185 @@
+import json
+import os
+import time
+from collections import OrderedDict
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # optional: only needed for CACHE_BACKEND=redis
+    redis = None
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")          # memory | redis
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+SKILL_CACHE_TTL = float(os.getenv("SKILL_CACHE_TTL", "300"))
+NEGATIVE_CACHE_TTL = float(os.getenv("NEGATIVE_CACHE_TTL", "10"))
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+# a reservation whose request never finished (worker crash) frees the key after this long
+IDEMPOTENCY_PENDING_TTL = float(os.getenv("IDEMPOTENCY_PENDING_TTL", "60"))
+
+_MISSING = object()
+
+
+class MemoryBackend:
+    """Size-bounded LRU with per-entry expiry, local to the process."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._data = OrderedDict()   # key -> (value, expires_at)
+
+    async def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return _MISSING
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
+
+    async def set(self, key, value, ttl: float):
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    async def add(self, key, value, ttl: float) -> bool:
+        """Set only if the key is absent (or expired); True when it was set."""
+        if await self.get(key) is not _MISSING:
+            return False
+        await self.set(key, value, ttl)
+        return True
+
+    async def delete(self, key):
+        self._data.pop(key, None)
+
+    def size(self):
+        return len(self._data)
+
+    async def close(self):
+        self._data.clear()
+
+
+class RedisBackend:
+    """
+    Shared across uvicorn workers through any Redis-protocol server.
+    Expiry is native; LRU bounding is left to the server's maxmemory
+    policy, so evictions are not counted here.
+    """
+
+    def __init__(self, url: str = CACHE_REDIS_URL):
+        if redis is None:
+            raise RuntimeError("CACHE_BACKEND=redis needs the 'redis' package")
+        self.evictions = None
+        self._client = redis.from_url(url)
+
+    async def get(self, key):
+        raw = await self._client.get(key)
+        if raw is None:
+            return _MISSING
+        return json.loads(raw)["v"]
+
+    async def set(self, key, value, ttl: float):
+        await self._client.set(key, json.dumps({"v": value}, default=str), px=int(ttl * 1000))
+
+    async def add(self, key, value, ttl: float) -> bool:
+        """SET NX: atomic across workers; True when the key was set."""
+        return bool(await self._client.set(
+            key, json.dumps({"v": value}, default=str), px=int(ttl * 1000), nx=True
+        ))
+
+    async def delete(self, key):
+        await self._client.delete(key)
+
+    def size(self):
+        return None
+
+    async def close(self):
+        await self._client.aclose()
+
+
+def make_backend():
+    if CACHE_BACKEND == "redis":
+        return RedisBackend()
+    return MemoryBackend()
+
+
+class ReadThroughCache:
+    """
+    Read-through cache for one entity type. Misses call the loader and
+    store its result; a None result is cached too (negative caching)
+    for NEGATIVE_CACHE_TTL so repeated lookups of unknown keys stay
+    off the database. Writers call invalidate() after a change.
+    """
+
+    def __init__(self, namespace: str, ttl: float, backend=None, negative_ttl: float = NEGATIVE_CACHE_TTL):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.backend = backend or make_backend()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key):
+        return f"{self.namespace}:{key}"
+
+    async def get_or_load(self, key, loader):
+        value = await self.backend.get(self._key(key))
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = await loader(key)
+        await self.backend.set(self._key(key), value, self.ttl if value is not None else self.negative_ttl)
+        return value
+
+    async def get(self, key):
+        """Cached value without loading, or None on a miss."""
+        value = await self.backend.get(self._key(key))
+        if value is _MISSING:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    async def set(self, key, value):
+        await self.backend.set(self._key(key), value, self.ttl)
+
+    async def add(self, key, value, ttl: float = None) -> bool:
+        """Store value unless the key is already present; True when stored."""
+        return await self.backend.add(self._key(key), value, self.ttl if ttl is None else ttl)
+
+    async def invalidate(self, *keys):
+        for key in keys:
+            if key is not None:
+                await self.backend.delete(self._key(key))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": self.backend.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.backend.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+user_cache = ReadThroughCache("user", USER_CACHE_TTL)
+skill_cache = ReadThroughCache("skill", SKILL_CACHE_TTL)
+# responses of write endpoints, keyed by the caller's Idempotency-Key. With
+# the memory backend each worker has its own keys, so a retry that lands on
+# another worker is not recognised: run several workers with CACHE_BACKEND=redis.
+idempotency_cache = ReadThroughCache("idempotency", IDEMPOTENCY_TTL)
+
+
+async def close_caches():
+    await user_cache.backend.close()
+    await skill_cache.backend.close()
+    await idempotency_cache.backend.close()
@@ -0,0 +1,74 @@
+import asyncio
+import os
+import time
+
+TYPING_WINDOW_MS = float(os.getenv("TYPING_WINDOW_MS", "500"))
+TYPING_REFRESH_S = float(os.getenv("TYPING_REFRESH_S", "3"))
+
+
+class TypingCoalescer:
+    """
+    Merges typing events per (from_user, to_user) pair. A state change
+    goes out at once and opens a window of TYPING_WINDOW_MS; events inside
+    the window only overwrite the pending state, which is sent when the
+    window closes if it differs from what the recipient last saw.
+    Repeats of the state already sent (one per keystroke) are dropped
+    unless TYPING_REFRESH_S has passed, so a live indicator is refreshed
+    at most that often.
+    """
+
+    def __init__(self, send, window_ms: float = TYPING_WINDOW_MS, refresh_s: float = TYPING_REFRESH_S):
+        self._send = send           # async send(from_user, to_user, is_typing)
+        self.window = window_ms / 1000
+        self.refresh = refresh_s
+        self._last = {}             # (from, to) -> (state, sent_at)
+        self._pending = {}          # (from, to) -> latest state inside the window
+        self._windows = {}          # (from, to) -> window task
+        self.received = 0
+        self.sent = 0
+
+    async def push(self, from_user: str, to_user: str, is_typing: bool):
+        self.received += 1
+        key = (from_user, to_user)
+        is_typing = bool(is_typing)
+
+        if key in self._windows:
+            self._pending[key] = is_typing
+            return
+
+        last = self._last.get(key)
+        if last is not None and last[0] == is_typing and time.monotonic() - last[1] < self.refresh:
+            return
+
+        await self._emit(key, is_typing)
+        self._windows[key] = asyncio.create_task(self._window(key))
+
+    async def _emit(self, key, is_typing: bool):
+        self._last[key] = (is_typing, time.monotonic())
+        self.sent += 1
+        try:
+            await self._send(key[0], key[1], is_typing)
+        except Exception as e:
+            print(f"Error sending typing state {key}: {e}")
+
+    async def _window(self, key):
+        try:
+            while True:
+                await asyncio.sleep(self.window)
+                state = self._pending.pop(key, None)
+                if state is None or state == self._last[key][0]:
+                    return
+                await self._emit(key, state)
+        finally:
+            self._windows.pop(key, None)
+            if not self._last.get(key, (True,))[0]:
+                # indicator is off; nothing left to suppress for this pair
+                self._last.pop(key, None)
+
+    def stats(self):
+        return {
+            "received": self.received,
+            "sent": self.sent,
+            "coalesced": self.received - self.sent,
+            "open_windows": len(self._windows),
+        }
@@ -1,9 +1,106 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost factor; stored hashes with a different cost are upgraded on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# worker processes for hashing, and how many more calls may wait for one
+HASH_POOL_SIZE = int(os.getenv("HASH_POOL_SIZE", str(os.cpu_count() or 1)))
+HASH_QUEUE_DEPTH = int(os.getenv("HASH_QUEUE_DEPTH", "32"))
+# fraction of the pool bulk imports may occupy; logins keep the rest
+BULK_HASH_SHARE = float(os.getenv("BULK_HASH_SHARE", "0.5"))
+BULK_HASH_SLOTS = max(1, int(HASH_POOL_SIZE * BULK_HASH_SHARE))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 def hash_password(password: str):
     return pwd_context.hash(password)
 
 def verify_password(plain, hashed):
     return pwd_context.verify(plain, hashed)
+
+def needs_rehash(hashed: str) -> bool:
+    """True when the stored bcrypt cost ($2b$<cost>$...) differs from BCRYPT_ROUNDS."""
+    try:
+        return int(hashed.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return pwd_context.needs_update(hashed)
+
+def verify_and_rehash(plain, hashed):
+    """
+    Verify a password and, if it matches but was hashed with another
+    cost, hash it again. Returns (valid, new_hash or None).
+    """
+    if not verify_password(plain, hashed):
+        return False, None
+    if needs_rehash(hashed):
+        return True, hash_password(plain)
+    return True, None
+
+# ---------------- WORKER POOL ----------------
+_pool: Optional[ProcessPoolExecutor] = None
+_in_flight = 0
+_bulk_slots = asyncio.Semaphore(BULK_HASH_SLOTS)
+
+def start_hash_pool():
+    """Started from the app lifespan; without it calls fall back to threads."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=HASH_POOL_SIZE)
+
+def stop_hash_pool():
+    """Called from the async lifespan, so it never blocks on running hashes."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+
+async def _run_in_pool(fn, *args, shed: bool = True):
+    """Run fn in the pool; with shed, raise 429 instead of queueing past HASH_QUEUE_DEPTH."""
+    global _in_flight
+    if shed and _in_flight >= HASH_POOL_SIZE + HASH_QUEUE_DEPTH:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many password operations in progress, retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    _in_flight += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_pool, fn, *args)
+    finally:
+        _in_flight -= 1
+
+async def hash_password_async(password: str):
+    """hash_password in the worker pool; raises 429 when the queue is full."""
+    return await _run_in_pool(hash_password, password)
+
+async def verify_password_async(plain, hashed):
+    """verify_and_rehash in the worker pool; raises 429 when the queue is full."""
+    return await _run_in_pool(verify_and_rehash, plain, hashed)
+
+async def _bulk_hash(password: str):
+    async with _bulk_slots:
+        # already bounded by the bulk share, so it waits instead of shedding
+        return await _run_in_pool(hash_password, password, shed=False)
+
+async def hash_passwords_async(passwords):
+    """
+    Hash a batch for a bulk import, one password per pool task, with at
+    most BULK_HASH_SLOTS in flight. Each task goes into the pool's queue
+    alone, so logins interleave with the import instead of waiting
+    behind whole slices. Order is kept.
+    """
+    return list(await asyncio.gather(*(_bulk_hash(p) for p in passwords)))
+
+def hash_pool_stats():
+    return {
+        "pool_size": HASH_POOL_SIZE,
+        "queue_depth": HASH_QUEUE_DEPTH,
+        "bulk_slots": BULK_HASH_SLOTS,
+        "in_flight": _in_flight,
+        "bcrypt_rounds": BCRYPT_ROUNDS,
+    }
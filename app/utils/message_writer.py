@@ -0,0 +1,217 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from app.repositories import messages as messages_repo
+from app.repositories import conversations as conversations_repo
+
+MESSAGE_FLUSH_MS = float(os.getenv("MESSAGE_FLUSH_MS", "50"))
+MESSAGE_FLUSH_SIZE = int(os.getenv("MESSAGE_FLUSH_SIZE", "100"))
+# transient insert failures are retried with exponential backoff, up to this many attempts
+MESSAGE_RETRY_BASE_MS = float(os.getenv("MESSAGE_RETRY_BASE_MS", "100"))
+MESSAGE_RETRY_MAX_S = float(os.getenv("MESSAGE_RETRY_MAX_S", "10"))
+MESSAGE_MAX_ATTEMPTS = int(os.getenv("MESSAGE_MAX_ATTEMPTS", "20"))
+# stop() keeps retrying for at most this long before giving up on what is left
+MESSAGE_DRAIN_TIMEOUT = float(os.getenv("MESSAGE_DRAIN_TIMEOUT", "30"))
+
+# Postgres error classes worth retrying: connection, transaction rollback,
+# insufficient resources, operator intervention, system error
+_TRANSIENT_SQLSTATES = ("08", "40", "53", "57", "58")
+
+
+def is_transient(error: Exception) -> bool:
+    """Network trouble, 5xx-style and connection-class database errors; not bad rows."""
+    if isinstance(error, httpx.TransportError):
+        return True
+    code = getattr(error, "code", None)
+    if code is None:
+        # no SQLSTATE: a gateway error page or an unexpected failure, retried (bounded)
+        return True
+    code = str(code)
+    # PGRST000-003: PostgREST could not reach the database
+    return code.startswith("PGRST00") or code[:2] in _TRANSIENT_SQLSTATES
+
+
+class MessageWriter:
+    """
+    Write-behind persistence for chat messages. submit() returns at once
+    with the row to relay and a future for the stored row; a background
+    task groups pending rows into multi-row inserts, flushed every
+    MESSAGE_FLUSH_MS or as soon as MESSAGE_FLUSH_SIZE are waiting.
+
+    There is a single flusher and batches go out one at a time in
+    submission order, so ids follow the order messages were received
+    (per conversation included). A batch that fails transiently goes
+    back to the head of the queue and is retried with backoff; only a
+    permanent error (a row the database rejects, or MESSAGE_MAX_ATTEMPTS
+    transient ones) fails messages, and then row by row so one bad row
+    does not take its batch down. Conversation summaries are updated
+    once per flush, per pair. stop() drains everything still pending
+    before returning.
+    """
+
+    def __init__(self, flush_ms: float = MESSAGE_FLUSH_MS, flush_size: int = MESSAGE_FLUSH_SIZE):
+        self.flush_interval = flush_ms / 1000
+        self.flush_size = flush_size
+        self._pending = []          # (row, future), submission order
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._task = None
+        self._attempts = 0          # consecutive failures of the batch at the head
+        self.flushes = 0
+        self.written = 0
+        self.retries = 0
+        self.failed = 0
+        self.last_flush = None
+        self.last_error = None
+
+    def submit(self, from_user: str, to_user: str, text: str):
+        """Queue a message; returns (row, future resolving to the stored row)."""
+        row = {
+            "from_user": from_user,
+            "to_user": to_user,
+            "message": text,
+            "created_at": datetime.now(timezone.utc).isoformat()
+        }
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((row, future))
+        if len(self._pending) >= self.flush_size:
+            self._wake.set()
+        return row, future
+
+    def _backoff(self) -> float:
+        return min(MESSAGE_RETRY_MAX_S, MESSAGE_RETRY_BASE_MS / 1000 * 2 ** (self._attempts - 1))
+
+    async def _insert(self, batch):
+        """
+        Insert one batch. Returns the stored rows, or None after a
+        transient failure (the batch is back at the head of the queue).
+        """
+        try:
+            return await messages_repo.create_many([row for row, _ in batch])
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            self._attempts += 1
+            if is_transient(e) and self._attempts < MESSAGE_MAX_ATTEMPTS:
+                print(f"Message flush of {len(batch)} rows failed (attempt {self._attempts}), retrying: {e}")
+                self.retries += 1
+                self._pending[:0] = batch
+                return None
+            print(f"Message flush of {len(batch)} rows failed permanently: {e}")
+            return await self._insert_one_by_one(batch, e)
+
+    async def _insert_one_by_one(self, batch, error: Exception):
+        """Isolate the rows the database rejects; fail only those."""
+        if len(batch) == 1:
+            self.failed += 1
+            _, future = batch[0]
+            if not future.done():
+                future.set_exception(error)
+            return [None]
+        stored = []
+        for row, future in batch:
+            try:
+                saved = await messages_repo.create_many([row])
+                stored.append(saved[0] if saved else None)
+            except Exception as e:
+                print(f"Message from {row['from_user']} to {row['to_user']} rejected: {e}")
+                self.failed += 1
+                if not future.done():
+                    future.set_exception(e)
+                stored.append(None)
+        return stored
+
+    async def flush(self, deadline: float = None):
+        """
+        Write everything pending, flush_size rows per insert. Waits out
+        the backoff between retries; with a deadline, gives up (and fails
+        what is left) once it passes.
+        """
+        while self._pending:
+            if self._attempts:
+                delay = self._backoff()
+                if deadline is not None and time.monotonic() + delay > deadline:
+                    self._give_up()
+                    return
+                await asyncio.sleep(delay)
+
+            batch = self._pending[:self.flush_size]
+            del self._pending[:self.flush_size]
+
+            start = time.perf_counter()
+            stored = await self._insert(batch)
+            if stored is None:
+                if deadline is None:
+                    return      # retried on the next tick, after the backoff
+                continue
+            self._attempts = 0
+
+            saved_rows = []
+            for (row, future), saved in zip(batch, stored + [None] * (len(batch) - len(stored))):
+                if future.done():
+                    continue
+                future.set_result(saved or row)
+                saved_rows.append(saved or row)
+
+            self.flushes += 1
+            self.written += len(saved_rows)
+            self.last_flush = {"rows": len(saved_rows), "seconds": time.perf_counter() - start}
+            await self._record_conversations(saved_rows)
+
+    async def _record_conversations(self, rows):
+        # Keep the summaries (last message, unread count) current, one write per flush
+        try:
+            await conversations_repo.record_messages(rows)
+        except Exception as e:
+            print(f"Error updating conversation summaries: {e}")
+
+    def _give_up(self):
+        print(f"⚠️ Giving up on {len(self._pending)} unsaved chat messages at shutdown: {self.last_error}")
+        error = RuntimeError(f"message not saved: {self.last_error}")
+        for row, future in self._pending:
+            print(f"   unsaved: {row}")
+            self.failed += 1
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
+
+    # ---------------- BACKGROUND JOB ----------------
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+        await self.flush(deadline=time.monotonic() + MESSAGE_DRAIN_TIMEOUT)
+
+    def start(self):
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop accepting flush ticks and drain what is still pending."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        await self._task
+        self._task = None
+
+    def stats(self):
+        return {
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "written": self.written,
+            "retries": self.retries,
+            "failed": self.failed,
+            "last_flush": self.last_flush,
+            "last_error": self.last_error,
+        }
+
+
+message_writer = MessageWriter()
@@ -0,0 +1,196 @@
+import os
+import time
+from contextvars import ContextVar
+
+from fastapi import Request
+
+# log requests slower than this with their DB-call breakdown; 0 disables
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+BYTES_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7)
+
+# DB calls made while handling the current request: [(table, status, bytes, seconds)]
+_db_calls: ContextVar = ContextVar("db_calls", default=None)
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _number(value) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+
+    def inc(self, *label_values, amount=1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for values, total in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labels, values)} {_number(total)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative buckets per label set, in the Prometheus exposition layout."""
+
+    def __init__(self, name: str, help: str, buckets, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._series = {}       # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, series in sorted(self._series.items()):
+            for bound, count in zip(self.buckets, series):
+                labels = _labels(self.labels + ("le",), values + (_number(bound),))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _labels(self.labels, values)
+            lines.append(f"{self.name}_sum{labels} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+def _scraped(kind: str, name: str, help: str, samples) -> list:
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        if value is None:
+            continue
+        lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {_number(value)}")
+    return lines
+
+
+def gauge(name: str, help: str, samples) -> list:
+    """Exposition lines of a gauge read at scrape time; samples are (labels dict, value)."""
+    return _scraped("gauge", name, help, samples)
+
+
+def counter(name: str, help: str, samples) -> list:
+    """Like gauge(), for a running total kept elsewhere (e.g. ConnectionManager)."""
+    return _scraped("counter", name, help, samples)
+
+
+http_requests = Counter(
+    "http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")
+)
+http_latency = Histogram(
+    "http_request_duration_seconds", "Time to the response start, per route.",
+    LATENCY_BUCKETS, ("method", "route")
+)
+db_calls_per_request = Histogram(
+    "db_calls_per_request", "Supabase calls made while handling one request.",
+    COUNT_BUCKETS, ("method", "route")
+)
+db_bytes_per_request = Histogram(
+    "db_response_bytes_per_request", "Bytes read from Supabase while handling one request.",
+    BYTES_BUCKETS, ("method", "route")
+)
+db_call_latency = Histogram(
+    "db_call_duration_seconds", "Duration of one Supabase call, per table.",
+    LATENCY_BUCKETS, ("table",)
+)
+
+
+# ---------------- SUPABASE CLIENT HOOKS ----------------
+def _table(url) -> str:
+    """/rest/v1/users -> users, /rest/v1/rpc/fn -> rpc/fn"""
+    path = url.path
+    return path.split("/rest/v1/", 1)[1] if "/rest/v1/" in path else path
+
+
+async def _on_db_request(request):
+    request.extensions["metrics_start"] = time.perf_counter()
+
+
+async def _on_db_response(response):
+    start = response.request.extensions.get("metrics_start")
+    if start is None:
+        return
+    await response.aread()
+    seconds = time.perf_counter() - start
+    table = _table(response.request.url)
+    db_call_latency.observe(seconds, table)
+
+    calls = _db_calls.get()
+    if calls is not None:
+        calls.append((table, response.status_code, len(response.content), seconds))
+
+
+def httpx_event_hooks():
+    """event_hooks for the shared httpx client behind the Supabase client."""
+    return {"request": [_on_db_request], "response": [_on_db_response]}
+
+
+# ---------------- REQUEST MIDDLEWARE ----------------
+def _db_breakdown(calls) -> str:
+    by_table = {}
+    for table, _, size, seconds in calls:
+        count, total_size, total_seconds = by_table.get(table, (0, 0, 0.0))
+        by_table[table] = (count + 1, total_size + size, total_seconds + seconds)
+    return ", ".join(
+        f"{table} x{count} ({1000 * seconds:.0f}ms, {size}B)"
+        for table, (count, size, seconds) in sorted(by_table.items(), key=lambda item: -item[1][2])
+    )
+
+
+async def metrics_middleware(request: Request, call_next):
+    calls = []
+    token = _db_calls.set(calls)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        seconds = time.perf_counter() - start
+        _db_calls.reset(token)
+
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        method = request.method
+        http_requests.inc(method, path, status)
+        http_latency.observe(seconds, method, path)
+        db_calls_per_request.observe(len(calls), method, path)
+        db_bytes_per_request.observe(sum(size for _, _, size, _ in calls), method, path)
+
+        if SLOW_REQUEST_MS and 1000 * seconds >= SLOW_REQUEST_MS:
+            print(
+                f"🐢 Slow request {method} {request.url.path} ({path}) {1000 * seconds:.0f}ms, "
+                f"{len(calls)} DB calls: {_db_breakdown(calls) or 'none'}"
+            )
+
+
+def render(*sections) -> str:
+    """Every request metric followed by the scrape-time sections given."""
+    lines = []
+    for metric in (http_requests, http_latency, db_calls_per_request, db_bytes_per_request, db_call_latency):
+        lines += metric.render()
+    for section in sections:
+        lines += section
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,74 @@
+import json
+from typing import Optional
+
+from fastapi import HTTPException, Response
+from fastapi.responses import StreamingResponse
+
+from app.db import fetch_page, iter_pages
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 1000
+
+
+def parse_fields(fields: Optional[str], allowed, default: str = "*", key: str = None) -> str:
+    """
+    Turn ?fields=a,b into a select string, rejecting unknown columns.
+    The key is always selected so a keyset cursor can advance.
+    """
+    if not fields:
+        return default
+    columns = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [c for c in columns if c not in allowed]
+    if unknown:
+        raise HTTPException(400, f"Unknown field(s): {', '.join(unknown)}")
+    if key and key not in columns:
+        columns.insert(0, key)
+    return ", ".join(columns)
+
+
+async def _ndjson(table, key, columns, filters, cursor, limit):
+    sent = 0
+    async for rows in iter_pages(table, key, columns, filters, cursor, DEFAULT_PAGE_SIZE):
+        if limit is not None:
+            rows = rows[:limit - sent]
+        yield "".join(json.dumps(row, default=str) + "\n" for row in rows)
+        sent += len(rows)
+        if limit is not None and sent >= limit:
+            return
+
+
+async def list_rows(
+    response: Response,
+    table: str,
+    key: str,
+    columns: str,
+    filters: dict,
+    cursor: Optional[str],
+    limit: Optional[int],
+    format: str,
+):
+    """
+    Shared body of the GET list endpoints.
+
+    - format=ndjson streams every row after the cursor (capped by limit),
+      fetched page by page so API memory stays flat.
+    - with a limit, returns one keyset page and sets X-Next-Cursor when
+      more rows may follow.
+    - otherwise returns the whole (filtered) table as a JSON array.
+    """
+    if format == "ndjson":
+        return StreamingResponse(
+            _ndjson(table, key, columns, filters, cursor, limit),
+            media_type="application/x-ndjson"
+        )
+
+    if limit is None:
+        rows = []
+        async for page in iter_pages(table, key, columns, filters, cursor, MAX_PAGE_SIZE):
+            rows.extend(page)
+        return rows
+
+    rows = await fetch_page(table, key, columns, filters, cursor, limit)
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = str(rows[-1][key])
+    return rows
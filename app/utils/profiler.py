@@ -0,0 +1,150 @@
+import os
+import sys
+import threading
+import time
+
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from app.utils.auth import verify_token, is_admin
+
+# Nothing below is installed unless PROFILING_ENABLED is set (see main.py)
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "").lower() in ("1", "true", "yes")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+
+PROFILE_FORMATS = ("collapsed", "speedscope")
+
+
+class Sampler:
+    """
+    Wall-clock sampling profiler: a daemon thread reads every other
+    thread's stack with sys._current_frames() each interval and counts
+    identical stacks. Covers the event loop and the threadpool alike;
+    on the loop thread, every coroutine running at the time is sampled.
+    """
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.samples = {}       # (thread name, (name, file, line), ...) root first -> count
+        self.started = None
+        self.seconds = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                key = (names.get(ident, str(ident)),) + tuple(reversed(stack))
+                self.samples[key] = self.samples.get(key, 0) + 1
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.seconds = time.perf_counter() - self.started
+        return self
+
+    # ---------------- OUTPUT ----------------
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed stacks: "thread;outer;...;inner count" per line."""
+        lines = []
+        for key, count in sorted(self.samples.items(), key=lambda item: -item[1]):
+            thread, stack = key[0], key[1:]
+            frames = [thread] + [f"{name} ({os.path.basename(file)}:{line})" for name, file, line in stack]
+            lines.append(";".join(f.replace(";", ":") for f in frames) + f" {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self, name: str) -> dict:
+        """A speedscope.app file with one sampled profile per thread."""
+        frames, frame_index = [], {}
+        by_thread = {}
+        for key, count in self.samples.items():
+            indices = []
+            for frame in key[1:]:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                indices.append(frame_index[frame])
+            samples, weights = by_thread.setdefault(key[0], ([], []))
+            samples.append(indices)
+            weights.append(count * self.interval)
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "skillsync-profiler",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": thread,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": samples,
+                    "weights": weights,
+                }
+                for thread, (samples, weights) in by_thread.items()
+            ],
+        }
+
+    def response(self, format: str, name: str):
+        if format == "speedscope":
+            return JSONResponse(
+                self.speedscope(name),
+                headers={"Content-Disposition": 'attachment; filename="profile.speedscope.json"'}
+            )
+        return PlainTextResponse(self.collapsed())
+
+
+# ---------------- PER-REQUEST PROFILING ----------------
+def _requested_format(request: Request):
+    """?profile=collapsed|speedscope or an X-Profile header with the same values."""
+    value = request.query_params.get("profile") or request.headers.get("x-profile")
+    if not value:
+        return None
+    return value if value in PROFILE_FORMATS else "collapsed"
+
+
+async def profile_middleware(request: Request, call_next):
+    """
+    Run a request under the sampler and answer with the profile instead
+    of the response. Only installed when PROFILING_ENABLED is set.
+    """
+    format = _requested_format(request)
+    if format is None:
+        return await call_next(request)
+
+    auth = request.headers.get("authorization", "")
+    try:
+        claims = verify_token(auth[7:] if auth.lower().startswith("bearer ") else "")
+    except HTTPException as e:
+        return JSONResponse({"detail": e.detail}, status_code=e.status_code)
+    if not is_admin(claims):
+        return JSONResponse({"detail": "Profiling is restricted to admins"}, status_code=403)
+
+    sampler = Sampler().start()
+    try:
+        response = await call_next(request)
+    finally:
+        sampler.stop()
+    result = sampler.response(format, f"{request.method} {request.url.path}")
+    result.headers["X-Profiled-Status"] = str(response.status_code)
+    result.headers["X-Profiled-Seconds"] = f"{sampler.seconds:.3f}"
+    return result
+
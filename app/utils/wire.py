@@ -0,0 +1,72 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # optional: faster JSON frames when installed
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional: only needed for the msgpack subprotocol
+    msgpack = None
+
+MSGPACK_SUBPROTOCOL = "skillsync.msgpack"
+JSON_SUBPROTOCOL = "skillsync.json"
+
+
+class JsonCodec:
+    """Text frames of JSON, the default wire format; orjson when available."""
+
+    binary = False
+
+    def __init__(self, subprotocol: str = None):
+        self.subprotocol = subprotocol
+
+    def encode(self, message: dict) -> str:
+        if orjson is not None:
+            return orjson.dumps(message, default=str).decode()
+        return json.dumps(message, default=str)
+
+    def decode(self, frame):
+        if orjson is not None:
+            return orjson.loads(frame)
+        return json.loads(frame)
+
+    async def send(self, websocket, message: dict):
+        await websocket.send_text(self.encode(message))
+
+    async def receive(self, websocket):
+        return self.decode(await websocket.receive_text())
+
+
+class MsgpackCodec:
+    """Binary frames of MessagePack, for clients that negotiate it."""
+
+    binary = True
+    subprotocol = MSGPACK_SUBPROTOCOL
+
+    def encode(self, message: dict) -> bytes:
+        return msgpack.packb(message, default=str, use_bin_type=True)
+
+    def decode(self, frame):
+        return msgpack.unpackb(frame, raw=False)
+
+    async def send(self, websocket, message: dict):
+        await websocket.send_bytes(self.encode(message))
+
+    async def receive(self, websocket):
+        return self.decode(await websocket.receive_bytes())
+
+
+def negotiate(requested):
+    """
+    Pick the codec for a socket from the subprotocols the client offered
+    (Sec-WebSocket-Protocol), in the client's order of preference.
+    Clients that offer none get plain JSON, as before.
+    """
+    for subprotocol in requested or ():
+        if subprotocol == MSGPACK_SUBPROTOCOL and msgpack is not None:
+            return MsgpackCodec()
+        if subprotocol == JSON_SUBPROTOCOL:
+            return JsonCodec(JSON_SUBPROTOCOL)
+    return JsonCodec()
@@ -0,0 +1,60 @@
+"""
+Per-request cost of JWT verification (app/utils/auth.py): a full
+decode_access_token() (signature, exp, iat, kid lookup) against a
+verify_token() claims-cache hit and the get_current_user dependency
+itself. No database or server is involved.
+
+    python benchmarks/bench_auth.py --iterations 20000 --tokens 1000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("JWT_SECRET", "bench-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app.utils import auth
+
+
+def per_call(fn, items, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(items[i % len(items)])
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--tokens", type=int, default=1000, help="distinct tokens cycled through")
+    args = parser.parse_args()
+
+    tokens = [auth.create_access_token({"username": f"user{i}", "role": "mentee"}) for i in range(args.tokens)]
+    credentials = [HTTPAuthorizationCredentials(scheme="Bearer", credentials=t) for t in tokens]
+
+    for token in tokens:
+        auth.verify_token(token)    # fill the claims cache
+
+    loop = asyncio.new_event_loop()
+    rows = [
+        ("decode (no cache)", per_call(auth.decode_access_token, tokens, args.iterations)),
+        ("verify_token hit", per_call(auth.verify_token, tokens, args.iterations)),
+        ("get_current_user", per_call(
+            lambda c: loop.run_until_complete(auth.get_current_user(c)), credentials, args.iterations
+        )),
+    ]
+    loop.close()
+
+    print(f"{auth.JWT_ALGO}, {args.tokens} distinct tokens, {args.iterations} calls each")
+    print(f"{'':20}{'us/request':>12}{'requests/s':>14}")
+    for name, seconds in rows:
+        print(f"{name:20}{1e6 * seconds:12.1f}{1 / seconds:14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+POST /bulk/import throughput (rows/second) on a synthetic NDJSON file,
+against an httpx.MockTransport that answers PostgREST like an empty
+project instead of a live one.
+
+Every row is a user with 1-5 skills; every other row is a mentee
+listing one mentor from earlier in the file. The mock answers at once
+(plus --rtt-ms per call), so the figure is the app's own cost: parsing,
+validation, bcrypt in the worker pool and building the inserts.
+bcrypt dominates: it runs at --rounds (default 4, not the production
+12) so the rest stays visible; at cost 12 expect about what
+bench_login.py reports per core.
+
+--bad-rows makes the mock reject user inserts containing that many
+rows (as a unique violation would), to show the cost of isolating them.
+
+    python benchmarks/bench_bulk_import.py --rows 50000 --rounds 4 --bad-rows 0
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("SUPABASE_URL", "http://supabase.test")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "bench.bench.bench")
+os.environ.setdefault("JWT_SECRET", "bench-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+
+N_SKILLS = 50
+
+
+def synthetic_file(rows: int, seed: int = 1) -> bytes:
+    rng = random.Random(seed)
+    lines = []
+    for i in range(rows):
+        mentee = i % 2 == 1
+        record = {
+            "username": f"bulk{i}",
+            "name": f"Bulk User {i}",
+            "password": f"password-{i}",
+            "role": "mentee" if mentee else "mentor",
+            "experience_level": rng.choice(["beginner", "intermediate", "advanced", "expert"]),
+            "skills": [f"skill{s}" for s in rng.sample(range(N_SKILLS), rng.randint(1, 5))],
+        }
+        if mentee:
+            record["mentors"] = [f"bulk{i - 1}"]
+        lines.append(json.dumps(record))
+    return ("\n".join(lines) + "\n").encode()
+
+
+class PostgREST:
+    """Just enough of PostgREST for the import: empty selects, echoing inserts."""
+
+    def __init__(self, rtt_ms: float, bad_usernames):
+        self.rtt = rtt_ms / 1000
+        self.bad = set(bad_usernames)
+        self.next_id = 1
+        self.calls = 0
+        self.skills = [
+            {"skill_id": s + 1, "name": f"skill{s}", "category": "bench", "skill_description": ""}
+            for s in range(N_SKILLS)
+        ]
+
+    def _json(self, status, body):
+        return httpx.Response(status, content=json.dumps(body).encode(), headers={"content-type": "application/json"})
+
+    async def handle(self, request):
+        self.calls += 1
+        if self.rtt:
+            await asyncio.sleep(self.rtt)
+        table = request.url.path.rsplit("/", 1)[-1]
+        if request.method == "GET":
+            return self._json(200, self.skills if table == "skills" else [])
+
+        rows = json.loads(request.content)
+        rows = rows if isinstance(rows, list) else [rows]
+        if table == "users":
+            if any(row["username"] in self.bad for row in rows):
+                return self._json(409, {
+                    "code": "23505", "message": "duplicate key value violates unique constraint",
+                    "details": None, "hint": None,
+                })
+            for row in rows:
+                row["user_id"] = self.next_id
+                self.next_id += 1
+        return self._json(201, rows)
+
+
+async def run(args, body: bytes):
+    # imported here: app.utils.hashing reads BCRYPT_ROUNDS at import time
+    from fastapi import FastAPI
+
+    from app.db import init_supabase, close_supabase
+    from app.routes import bulk
+    from app.utils.auth import require_admin
+    from app.utils.hashing import start_hash_pool, stop_hash_pool, HASH_POOL_SIZE
+
+    rng = random.Random(2)
+    backend = PostgREST(args.rtt_ms, (f"bulk{i}" for i in rng.sample(range(args.rows), args.bad_rows)))
+    await init_supabase(transport=httpx.MockTransport(backend.handle))
+    start_hash_pool()
+
+    app = FastAPI()
+    app.include_router(bulk.router)
+    app.dependency_overrides[require_admin] = lambda: {"username": "bench"}
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://app", timeout=None) as client:
+            start = time.perf_counter()
+            response = await client.post("/bulk/import?format=ndjson", content=body)
+            seconds = time.perf_counter() - start
+    finally:
+        stop_hash_pool()
+        await close_supabase()
+    return response.json(), seconds, backend.calls, HASH_POOL_SIZE
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--rounds", type=int, default=4, help="bcrypt cost for the run")
+    parser.add_argument("--rtt-ms", type=float, default=0.0)
+    parser.add_argument("--bad-rows", type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    body = synthetic_file(args.rows)
+    report, seconds, calls, pool_size = asyncio.run(run(args, body))
+
+    print(f"{args.rows:,} rows ({len(body) / 1e6:.1f} MB NDJSON), bcrypt cost {args.rounds}, "
+          f"{pool_size} hash workers, rtt {args.rtt_ms:g} ms")
+    print(f"users {report['users_created']:,}  skills {report['skills_assigned']:,}  "
+          f"mentorships {report['mentorships_created']:,}  failed rows {report['failed_rows']:,}")
+    print(f"{seconds:.1f} s, {args.rows / seconds:,.0f} rows/s, {calls:,} PostgREST calls")
+
+
+if __name__ == "__main__":
+    main()
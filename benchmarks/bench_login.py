@@ -0,0 +1,65 @@
+"""
+Login throughput of the bcrypt worker pool (app/utils/hashing.py):
+concurrent verify_password_async() calls, the CPU-bound part of
+POST /users/login, against a stored hash at BCRYPT_ROUNDS. With
+--rehash the stored hash uses another cost, so every login also pays
+for the transparent rehash.
+
+    BCRYPT_ROUNDS=12 HASH_POOL_SIZE=4 python benchmarks/bench_login.py --logins 64
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from passlib.hash import bcrypt
+
+from app.utils import hashing
+
+PASSWORD = "correct horse battery staple"
+
+
+async def run(logins: int, stored: str):
+    # stay inside the queue-depth limit, like well-behaved clients retrying on 429
+    gate = asyncio.Semaphore(hashing.HASH_POOL_SIZE + hashing.HASH_QUEUE_DEPTH)
+
+    async def login():
+        async with gate:
+            valid, _ = await hashing.verify_password_async(PASSWORD, stored)
+            assert valid
+
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--rehash", action="store_true", help="stored hash uses BCRYPT_ROUNDS - 1")
+    args = parser.parse_args()
+
+    rounds = hashing.BCRYPT_ROUNDS - 1 if args.rehash else hashing.BCRYPT_ROUNDS
+    stored = bcrypt.using(rounds=rounds).hash(PASSWORD)
+
+    hashing.start_hash_pool()
+    try:
+        asyncio.run(run(hashing.HASH_POOL_SIZE, stored))     # start the worker processes
+        seconds = asyncio.run(run(args.logins, stored))
+    finally:
+        hashing.stop_hash_pool()
+
+    cores = min(hashing.HASH_POOL_SIZE, os.cpu_count() or 1)
+    print(
+        f"bcrypt cost {hashing.BCRYPT_ROUNDS} (stored {rounds}), pool {hashing.HASH_POOL_SIZE}, "
+        f"{os.cpu_count()} CPUs, {args.logins} logins in {seconds:.2f}s"
+    )
+    print(f"{args.logins / seconds:.1f} logins/s, {args.logins / seconds / cores:.1f} logins/s per core, "
+          f"{1000 * seconds * cores / args.logins:.0f} ms CPU per login")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Throughput of the match scorers in app/ml/matcher.py on a synthetic
+10k candidate x 1k skill matrix: each query row is scored against
+every candidate with score_with(), as the /match route does.
+
+    python benchmarks/bench_scorers.py --users 10000 --skills 1000 --queries 200
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.ml.matcher import SCORERS, score_with, idf_weights, category_matrix
+
+
+def synthetic(n_users, n_skills, n_categories, seed):
+    """Binary users x skills matrix, 3-15 skills per user, long-tailed popularity."""
+    rng = np.random.default_rng(seed)
+    popularity = 1.0 / np.arange(1, n_skills + 1) ** 0.8
+    popularity /= popularity.sum()
+
+    rows, cols = [], []
+    for r in range(n_users):
+        picked = rng.choice(n_skills, size=rng.integers(3, 16), replace=False, p=popularity)
+        rows.extend([r] * len(picked))
+        cols.extend(picked)
+    matrix = csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(n_users, n_skills))
+
+    doc_freq = np.asarray((matrix > 0).sum(axis=0)).ravel()
+    levels = rng.choice([0, 1, 2, 3, np.nan], size=n_users).astype(float)
+    context = {
+        "idf": idf_weights(doc_freq, n_users),
+        "skill_category": category_matrix([f"c{c}" for c in rng.integers(0, n_categories, n_skills)]),
+        "candidate_levels": levels,
+        "query_level": 1.0,
+        "candidates_are_mentors": True,
+    }
+    return matrix, context, rng
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--skills", type=int, default=1000)
+    parser.add_argument("--categories", type=int, default=30)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    matrix, context, rng = synthetic(args.users, args.skills, args.categories, args.seed)
+    queries = rng.integers(0, args.users, args.queries)
+
+    print(f"{args.users} candidates x {args.skills} skills, {matrix.nnz} assignments, {args.queries} queries")
+    print(f"{'scorer':12}{'ms/query':>10}{'queries/s':>12}{'candidates/s':>15}")
+    for scorer in SCORERS:
+        score_with(scorer, matrix, matrix[queries[0]], context)     # warm-up
+        start = time.perf_counter()
+        for q in queries:
+            score_with(scorer, matrix, matrix[q], context)
+        seconds = (time.perf_counter() - start) / len(queries)
+        print(f"{scorer:12}{1000 * seconds:10.2f}{1 / seconds:12.0f}{args.users / seconds:15.3g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Typing-indicator fan-out through the TypingCoalescer
+(app/utils/coalesce.py) under a synthetic load: pairs of users typing
+in bursts of keystrokes with pauses between them. Every keystroke sends
+is_typing=true and a burst ends with is_typing=false a second after the
+last key, as a client without its own debouncing does.
+
+Time is simulated: the event loop's clock jumps to the next timer, so
+60 seconds of typing run in well under a second and the result only
+depends on the seed.
+
+    python benchmarks/bench_typing.py --pairs 200 --seconds 60
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.utils import coalesce
+from app.utils.coalesce import TypingCoalescer
+
+
+class SimulatedLoop(asyncio.SelectorEventLoop):
+    """Event loop whose clock jumps to the next timer instead of waiting for it."""
+
+    def __init__(self):
+        super().__init__()
+        self._now = 0.0
+
+    def time(self):
+        return self._now
+
+    def _run_once(self):
+        if not self._ready and self._scheduled:
+            self._now = max(self._now, self._scheduled[0].when())
+        super()._run_once()
+
+
+async def typist(coalescer, from_user, to_user, seconds, rate, rng):
+    loop = asyncio.get_running_loop()
+    while loop.time() < seconds:
+        burst_end = loop.time() + rng.uniform(2, 10)
+        while loop.time() < min(burst_end, seconds):
+            await coalescer.push(from_user, to_user, True)
+            await asyncio.sleep(rng.expovariate(rate))
+        await asyncio.sleep(1.0)
+        await coalescer.push(from_user, to_user, False)
+        await asyncio.sleep(rng.uniform(1, 8))
+
+
+async def run(args):
+    sent = 0
+
+    async def send(from_user, to_user, is_typing):
+        nonlocal sent
+        sent += 1
+
+    coalescer = TypingCoalescer(send)
+    rng = random.Random(args.seed)
+    await asyncio.gather(*(
+        typist(coalescer, f"user{2 * i}", f"user{2 * i + 1}", args.seconds, args.rate, rng)
+        for i in range(args.pairs)
+    ))
+    await asyncio.sleep(2 * coalescer.window)     # let the last windows close
+    return coalescer.received, sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pairs", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument("--rate", type=float, default=6, help="keystrokes per second while typing")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    loop = SimulatedLoop()
+    # the coalescer's refresh interval reads time.monotonic(); follow the simulated clock
+    coalesce.time = types.SimpleNamespace(monotonic=loop.time)
+    try:
+        received, sent = loop.run_until_complete(run(args))
+    finally:
+        loop.close()
+
+    print(f"{args.pairs} pairs, {args.seconds:.0f} simulated seconds, ~{args.rate:g} keystrokes/s in bursts")
+    print(f"window {coalesce.TYPING_WINDOW_MS:.0f} ms, refresh {coalesce.TYPING_REFRESH_S:g} s")
+    print(f"received {received:>8,} events  ({received / args.seconds:,.0f}/s)")
+    print(f"sent     {sent:>8,} frames  ({sent / args.seconds:,.0f}/s)")
+    print(f"reduction {1 - sent / received:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+GET /users/{username} lookup latency, before and after the shared
+Supabase client (user-003), against an httpx.MockTransport instead of
+a live project.
+
+before: a new sync client per request (create_client in get_supabase())
+after:  the application-scoped async client from app.db.init_supabase()
+
+Both run the query the route runs on a user-cache miss. The mock
+answers at once, optionally after --rtt-ms; --connect-ms is charged on
+the first request of every transport, i.e. once per fresh client in
+"before" and once in total in "after", to model the TCP + TLS setup a
+new client pays on a real network.
+
+    python benchmarks/bench_user_lookup.py --requests 2000 --rtt-ms 0 --connect-ms 0
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("SUPABASE_URL", "http://supabase.test")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "bench.bench.bench")
+
+import httpx
+from supabase import create_client, ClientOptions
+
+from app.db import init_supabase, close_supabase
+from app.repositories import users as users_repo
+
+USER = {
+    "user_id": 1, "username": "ada", "name": "Ada", "password_hash": "x" * 60,
+    "role": "mentor", "phone_number": None, "experience_level": "expert", "profile_summary": "",
+}
+
+
+class Network:
+    def __init__(self, rtt_ms: float, connect_ms: float):
+        self.rtt = rtt_ms / 1000
+        self.connect = connect_ms / 1000
+        self.body = json.dumps([USER]).encode()
+
+    def delay(self, first: bool) -> float:
+        return self.rtt + (self.connect if first else 0.0)
+
+    def sync_transport(self):
+        first = [True]
+
+        def handle(request):
+            time.sleep(self.delay(first[0]))
+            first[0] = False
+            return httpx.Response(200, content=self.body, headers={"content-type": "application/json"})
+        return httpx.MockTransport(handle)
+
+    def async_transport(self):
+        first = [True]
+
+        async def handle(request):
+            await asyncio.sleep(self.delay(first[0]))
+            first[0] = False
+            return httpx.Response(200, content=self.body, headers={"content-type": "application/json"})
+        return httpx.MockTransport(handle)
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda p: samples[min(len(samples) - 1, int(p * len(samples)))]
+    return 1000 * pick(0.50), 1000 * pick(0.99), 1000 * statistics.mean(samples)
+
+
+def run_before(network: Network, n: int):
+    url, key = os.environ["SUPABASE_URL"], os.environ["SUPABASE_SERVICE_ROLE_KEY"]
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        client = create_client(
+            url, key, options=ClientOptions(httpx_client=httpx.Client(transport=network.sync_transport()))
+        )
+        client.table("users").select("*").eq("username", USER["username"]).execute()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def run_after(network: Network, n: int):
+    await init_supabase(transport=network.async_transport())
+    samples = []
+    try:
+        for _ in range(n):
+            start = time.perf_counter()
+            await users_repo.get_by_username(USER["username"])
+            samples.append(time.perf_counter() - start)
+    finally:
+        await close_supabase()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rtt-ms", type=float, default=0.0)
+    parser.add_argument("--connect-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    network = Network(args.rtt_ms, args.connect_ms)
+    before = run_before(network, args.requests)
+    after = asyncio.run(run_after(network, args.requests))
+
+    print(f"{args.requests} lookups, rtt {args.rtt_ms:g} ms, connect {args.connect_ms:g} ms")
+    print(f"{'':8}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for name, samples in (("before", before), ("after", after)):
+        p50, p99, mean = percentiles(samples)
+        print(f"{name:8}{p50:10.3f}{p99:10.3f}{mean:10.3f}")
+
+
+if __name__ == "__main__":
+    main()
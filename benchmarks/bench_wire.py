@@ -0,0 +1,76 @@
+"""
+Chat wire formats (app/utils/wire.py): bytes per frame and the time to
+encode and decode --frames of them with stdlib json, orjson and
+MessagePack, for a message ack (the frame with id, temp_id and status
+the sender gets once the message is stored) and a typing frame.
+
+stdlib is JsonCodec with orjson hidden, i.e. what a server without
+orjson sends; the frames are the ones app/routes/chat.py builds.
+
+    python benchmarks/bench_wire.py --frames 10000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from uuid import uuid4
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.utils import wire
+
+FRAMES = {
+    "message": {
+        "type": "message",
+        "id": 1843211,
+        "temp_id": uuid4().hex,
+        "from_user": "ada.lovelace",
+        "to_user": "charles.babbage",
+        "message": "Sounds good, let's go over the difference engine notes on Thursday at 3?",
+        "created_at": datetime(2026, 10, 18, 14, 3, 27, 512000, tzinfo=timezone.utc).isoformat(),
+        "status": "delivered",
+    },
+    "typing": {"type": "typing", "from_user": "ada.lovelace", "is_typing": True},
+}
+
+
+def timed(fn, items, frames):
+    start = time.perf_counter()
+    for i in range(frames):
+        fn(items[i % len(items)])
+    return time.perf_counter() - start
+
+
+def measure(codec, frame, frames):
+    encoded = codec.encode(frame)
+    size = len(encoded.encode() if isinstance(encoded, str) else encoded)
+    return size, timed(codec.encode, [frame], frames), timed(codec.decode, [encoded], frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=10000)
+    args = parser.parse_args()
+
+    codecs = []
+    orjson = wire.orjson
+    wire.orjson = None
+    codecs.append(("stdlib", wire.JsonCodec()))
+    if orjson is not None:
+        codecs.append(("orjson", wire.JsonCodec()))
+    if wire.msgpack is not None:
+        codecs.append(("msgpack", wire.MsgpackCodec()))
+
+    print(f"{args.frames} frames each")
+    print(f"{'codec':10}{'frame':10}{'bytes':>7}{'encode ms':>12}{'decode ms':>12}")
+    for name, frame in FRAMES.items():
+        for codec_name, codec in codecs:
+            wire.orjson = None if codec_name == "stdlib" else orjson
+            size, encode, decode = measure(codec, frame, args.frames)
+            print(f"{codec_name:10}{name:10}{size:>7}{1000 * encode:12.1f}{1000 * decode:12.1f}")
+    wire.orjson = orjson
+
+
+if __name__ == "__main__":
+    main()
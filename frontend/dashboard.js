@@ -270,7 +270,7 @@ async function loadAllSkills() {
 
 async function loadUserSkills() {
     try {
-        const res = await fetch(`${ENDPOINTS.USER_SKILLS}/${username}`, { headers: AUTH_HEADERS });
+        const res = await fetch(`${ENDPOINTS.USER_SKILLS}/${username}?fields=name,category`, { headers: AUTH_HEADERS });
         const skills = res.ok ? await res.json() : [];
         
         const list = document.getElementById("userSkillsList");
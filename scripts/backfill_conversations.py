@@ -0,0 +1,96 @@
+"""
+One-time backfill of the conversations summary table (user-015) from
+the messages table, for every pair of users at once.
+
+Create the table first (scripts/conversations.sql), then run this once,
+right after deploying. From then on the app keeps summaries current on
+every message, read and delete:
+
+    python scripts/backfill_conversations.py
+
+Messages are read in keyset pages by id, one page in memory at a time;
+only the per-pair summaries are kept. It is safe to re-run: a pair
+whose stored summary is newer than the messages scanned (written by
+the app while the script ran) keeps its last message, and unread
+counts are recomputed from messages.read, which is exact.
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.db import init_supabase, close_supabase, iter_pages, fetch_all, get_supabase
+from app.models.messages import TABLE_NAME as MESSAGES_TABLE
+from app.models.conversations import TABLE_NAME as CONVERSATIONS_TABLE
+from app.repositories import conversations as conversations_repo
+
+PAGE_SIZE = 1000
+
+
+def summarize(summaries: dict, msg: dict):
+    """Fold one message into both participants' summaries."""
+    for owner, partner in ((msg["from_user"], msg["to_user"]), (msg["to_user"], msg["from_user"])):
+        row = summaries.get((owner, partner))
+        if row is None:
+            row = summaries[(owner, partner)] = {
+                "owner": owner,
+                "partner": partner,
+                "last_message": None,
+                "last_message_time": None,
+                "last_from": None,
+                "unread_count": 0,
+            }
+        # pages come in id order, so a later message is never older
+        row["last_message"] = msg["message"]
+        row["last_message_time"] = msg["created_at"]
+        row["last_from"] = msg["from_user"]
+        if owner == msg["to_user"] and not msg.get("read"):
+            row["unread_count"] += 1
+
+
+async def stored_summaries():
+    """(owner, partner) -> last_message_time of the summaries already stored."""
+    rows = await fetch_all(
+        lambda: get_supabase().table(CONVERSATIONS_TABLE)
+        .select("owner, partner, last_message_time")
+        .order("owner").order("partner"),
+        page_size=PAGE_SIZE
+    )
+    return {(row["owner"], row["partner"]): row["last_message_time"] for row in rows}
+
+
+async def main():
+    await init_supabase()
+    try:
+        summaries = {}
+        scanned = 0
+        async for page in iter_pages(
+            MESSAGES_TABLE, "id", "id, from_user, to_user, message, created_at, read", page_size=PAGE_SIZE
+        ):
+            for msg in page:
+                summarize(summaries, msg)
+            scanned += len(page)
+            print(f"… {scanned} messages scanned, {len(summaries)} summaries")
+
+        # the app may have recorded newer messages for some pairs meanwhile
+        stored = await stored_summaries()
+        rows = []
+        for key, row in summaries.items():
+            newer = stored.get(key)
+            if newer is not None and newer > row["last_message_time"]:
+                fresh = (await get_supabase().table(CONVERSATIONS_TABLE).select("*")
+                         .eq("owner", key[0]).eq("partner", key[1]).execute()).data
+                if fresh:
+                    row = {**row, **{f: fresh[0][f] for f in ("last_message", "last_message_time", "last_from")}}
+            rows.append(row)
+
+        for i in range(0, len(rows), PAGE_SIZE):
+            await conversations_repo.save_many(rows[i:i + PAGE_SIZE])
+        print(f"✅ Backfilled {len(rows)} conversation summaries from {scanned} messages")
+    finally:
+        await close_supabase()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
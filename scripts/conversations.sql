@@ -0,0 +1,21 @@
+-- Conversation summary table (user-015): one row per (owner, partner), kept
+-- current by the chat message writer (conversations.record_messages),
+-- mark_read and delete_conversation, and filled once for existing messages
+-- by scripts/backfill_conversations.py. Run once in the Supabase SQL editor,
+-- before deploying the app and then running the backfill.
+
+create table if not exists conversations (
+    owner             text        not null,
+    partner           text        not null,
+    last_message      text,
+    last_message_time timestamptz,
+    last_from         text,
+    -- messages to owner from partner not yet read
+    unread_count      integer     not null default 0,
+    -- record_messages and save_many upsert on (owner, partner)
+    constraint conversations_owner_partner_key unique (owner, partner)
+);
+
+-- get_conversations: a user's summaries, most recent first
+create index if not exists conversations_owner_last_message_time_idx
+    on conversations (owner, last_message_time desc);
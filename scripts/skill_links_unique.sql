@@ -0,0 +1,23 @@
+-- Unique keys the skill link upserts need (user-005): user_skills.create_many
+-- and create_rows upsert on (user_id, skill_id), opportunities.add_skills on
+-- (opp_id, skill_id), both with ON CONFLICT DO NOTHING. Without them
+-- PostgREST rejects the request (42P10). Run once in the Supabase SQL editor;
+-- duplicate links left by the old check-then-insert are removed first.
+
+begin;
+
+delete from user_skills a
+    using user_skills b
+    where a.user_id = b.user_id and a.skill_id = b.skill_id and a.ctid > b.ctid;
+
+alter table user_skills
+    add constraint user_skills_user_id_skill_id_key unique (user_id, skill_id);
+
+delete from opportunity_skills a
+    using opportunity_skills b
+    where a.opp_id = b.opp_id and a.skill_id = b.skill_id and a.ctid > b.ctid;
+
+alter table opportunity_skills
+    add constraint opportunity_skills_opp_id_skill_id_key unique (opp_id, skill_id);
+
+commit;
@@ -0,0 +1,139 @@
+"""
+Recall@k of the inverted-index shortlist (app/ml/retrieval.py) against
+an exact cosine scan, on a synthetic skill graph. Needs numpy and scipy.
+"""
+import numpy as np
+import pytest
+from scipy.sparse import csr_matrix
+
+from app.ml.matcher import top_k
+from app.ml.retrieval import shortlist
+
+N_USERS = 3000
+N_SKILLS = 300
+N_QUERIES = 40
+
+
+def _graph(seed=7):
+    """Users with 1-12 skills drawn from a long-tailed (Zipf-like) popularity."""
+    rng = np.random.default_rng(seed)
+    popularity = 1.0 / np.arange(1, N_SKILLS + 1) ** 0.8
+    popularity /= popularity.sum()
+
+    bits, postings = {}, {col: set() for col in range(N_SKILLS)}
+    for user_id in range(N_USERS):
+        cols = rng.choice(N_SKILLS, size=rng.integers(1, 13), replace=False, p=popularity)
+        bits[user_id] = sum(1 << int(c) for c in cols)
+        for c in cols:
+            postings[int(c)].add(user_id)
+    queries = [
+        sorted(int(c) for c in rng.choice(N_SKILLS, size=rng.integers(1, 9), replace=False, p=popularity))
+        for _ in range(N_QUERIES)
+    ]
+    return bits, postings, queries
+
+
+def _matrix(bitsets):
+    rows, cols = [], []
+    for r, b in enumerate(bitsets):
+        for c in range(N_SKILLS):
+            if b >> c & 1:
+                rows.append(r)
+                cols.append(c)
+    return csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(bitsets), N_SKILLS))
+
+
+def _cosine(matrix, query_cols, user_ids):
+    """Exact binary cosine of the query against the given rows."""
+    query = np.zeros(N_SKILLS)
+    query[query_cols] = 1
+    rows = matrix[user_ids]
+    inter = rows @ query
+    norms = np.sqrt(np.asarray(rows.sum(axis=1)).ravel() * len(query_cols))
+    return np.divide(inter, norms, out=np.zeros_like(inter), where=norms > 0)
+
+
+def _top_scores(scores, k):
+    """The k best positive scores, best first (ties make ids ambiguous, scores are not)."""
+    positive = np.sort(scores[scores > 0])[::-1]
+    return positive[:k]
+
+
+@pytest.fixture(scope="module")
+def graph():
+    bits, postings, queries = _graph()
+    matrix = _matrix([bits[u] for u in range(N_USERS)])
+    return bits, postings, queries, matrix
+
+
+def _recall(graph, k, prune_factor):
+    bits, postings, queries, matrix = graph
+    eligible = set(range(N_USERS))
+    everyone = np.arange(N_USERS)
+    found = total = 0
+    for query_cols in queries:
+        exact = _top_scores(_cosine(matrix, query_cols, everyone), k)
+
+        candidates = shortlist(query_cols, postings, bits, eligible, k=k, prune_factor=prune_factor)
+        rescored = _top_scores(_cosine(matrix, query_cols, np.array(candidates, dtype=int)), k) \
+            if candidates else np.zeros(0)
+
+        # an exact hit is recalled when the shortlist reaches a score at least as good
+        total += len(exact)
+        found += sum(1 for i, score in enumerate(exact) if i < len(rescored) and rescored[i] >= score - 1e-12)
+    return found / total
+
+
+@pytest.mark.parametrize("k", [1, 5, 10, 50])
+def test_exact_when_not_pruning_harder(graph, k):
+    assert _recall(graph, k, prune_factor=1.0) == 1.0
+
+
+def _ranked_ids(matrix, query_cols, user_ids, k):
+    """Ids of the top k by cosine, ties in candidate (id) order, as the index ranks them."""
+    user_ids = np.array(sorted(user_ids), dtype=int)
+    if not len(user_ids):
+        return []
+    return [int(user_ids[i]) for i in top_k(_cosine(matrix, query_cols, user_ids), k)]
+
+
+@pytest.mark.parametrize("k", [1, 3, 10, 50])
+def test_same_ids_in_same_order_as_a_full_scan(graph, k):
+    bits, postings, queries, matrix = graph
+    eligible = set(range(N_USERS))
+    for query_cols in queries:
+        candidates = shortlist(query_cols, postings, bits, eligible, k=k)
+        assert _ranked_ids(matrix, query_cols, candidates, k) == _ranked_ids(matrix, query_cols, range(N_USERS), k)
+
+
+def test_ties_with_the_kth_score_are_not_pruned():
+    # three query skills, every user holds exactly one: each scores 1/sqrt(3),
+    # while the bound after two postings is sqrt(1/3), one ulp lower
+    postings = {0: {9}, 1: {8}, 2: {0, 1, 2, 3}}
+    bits = {u: 1 << c for c, users in postings.items() for u in users}
+    matrix = _matrix([bits.get(u, 0) for u in range(10)])
+
+    candidates = shortlist([0, 1, 2], postings, bits, set(bits), k=2)
+    assert _ranked_ids(matrix, [0, 1, 2], candidates, 2) == [0, 1]
+
+
+def test_lower_prune_factor_trades_recall_for_a_shorter_list(graph):
+    bits, postings, queries, _ = graph
+    eligible = set(range(N_USERS))
+    exact = sum(len(shortlist(q, postings, bits, eligible, k=10, prune_factor=1.0)) for q in queries)
+    pruned = sum(len(shortlist(q, postings, bits, eligible, k=10, prune_factor=0.3)) for q in queries)
+
+    assert pruned < exact
+    assert 0.0 < _recall(graph, 10, prune_factor=0.3) <= 1.0
+
+
+def test_without_k_every_eligible_user_sharing_a_skill(graph):
+    bits, postings, queries, _ = graph
+    eligible = set(range(0, N_USERS, 2))
+    for query_cols in queries[:10]:
+        expected = {u for c in query_cols for u in postings[c] if u in eligible}
+        assert set(shortlist(query_cols, postings, bits, eligible)) == expected
+
+
+def test_empty_query():
+    assert shortlist([], {}, {}, set(), k=10) == []